@@ -4,8 +4,25 @@ import re
 import sys 
 from datetime import datetime
 import math 
-from collections import defaultdict
-from typing import Dict, Any, List, Tuple, Union
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Any, Iterable, List, Tuple, Union
+
+# Parser JSON: usa o orjson (bem mais rápido) quando disponível, senão o json padrão.
+# Ambos recebem bytes; orjson.JSONDecodeError é subclasse de json.JSONDecodeError.
+try:
+    import orjson
+    _json_loads = orjson.loads
+except ImportError:
+    _json_loads = json.loads
+
+# Leitura em fluxo (ijson) para arquivos com uma lista de registros: evita carregar o
+# arquivo inteiro na memória. Opcional: sem o ijson, todo arquivo é lido de uma vez.
+_JSON_ERRORS: Tuple[type, ...] = (json.JSONDecodeError,)
+try:
+    import ijson
+    _JSON_ERRORS += (ijson.JSONError,)
+except ImportError:
+    ijson = None
 
 # --- Configurações ---
 # Arquivo de saída para o relatório de dimensionamento e estatísticas.
@@ -13,16 +30,20 @@ RELATORIO_FILE = "check-files.log"
 
 # Lista de campos que são do tipo TEXT no DDL (Data Definition Language)
 # e devem ser mantidos como TEXT (para evitar truncamento).
-FIELDS_TO_KEEP_LONG = [
+# frozenset: a pertinência ('chave in ...') é testada para todo campo de todo registro.
+FIELDS_TO_KEEP_LONG = frozenset({
     "descricaoClasse", "ementa", "decisao", "jurisprudenciaCitada", "notas", 
     "informacoesComplementares", "termosAuxiliares", "teseJuridica", 
     "referenciasLegislativas", "acordaosSimilares",
     "tema" 
-]
+})
 
 # Tamanho VARCHAR padrão para campos que apareceram, mas que tinham valor vazio ('').
 DEFAULT_VARCHAR_SIZE = 50 
 
+# Tamanho do buffer de leitura/escrita de arquivos (64KB reduz o número de syscalls)
+IO_BUFFER_SIZE = 65536
+
 # Formatos de data comuns a serem testados (Pode ser estendido conforme a fonte de dados)
 DATE_FORMATS = [
     "%Y-%m-%d %H:%M:%S",
@@ -31,13 +52,61 @@ DATE_FORMATS = [
     "%Y%m%d" # Formato comum em dados legados ou numéricos
 ]
 
+# Padrões pré-compilados (um por formato de DATE_FORMATS) para rejeitar rapidamente
+# strings que não têm o "formato" de data antes de chamar o strptime (custoso).
+# Os padrões aceitam tudo o que o strptime aceita: mês, dia e hora com 1 ou 2 dígitos
+# (o %d aceita também um espaço no lugar do primeiro dígito) e espaços entre data e hora.
+_DATE_REGEXES = [
+    (re.compile(r"^\d{4}-\d{1,2}-[ \d]?\d\s+\d{1,2}:\d{1,2}:\d{1,2}$"), "%Y-%m-%d %H:%M:%S"),
+    (re.compile(r"^\d{4}-\d{1,2}-[ \d]?\d$"), "%Y-%m-%d"),
+    (re.compile(r"^[ \d]?\d/\d{1,2}/\d{4}$"), "%d/%m/%Y"),
+    (re.compile(r"^\d{4}\d{1,2}[ \d]?\d$"), "%Y%m%d"),
+]
+
+# Faixa de tamanhos possíveis ('%Y%m%d' mais curto, '202135', até '%Y-%m-%d %H:%M:%S' completo):
+# qualquer texto fora dela não pode ser data.
+_DATE_MIN_LEN = 6
+_DATE_MAX_LEN = 19
+
+# Quantidade de arquivos enviados de uma vez a cada processo da varredura paralela.
+SCAN_CHUNKSIZE = 32
+
+# Intervalo (em arquivos) entre as atualizações da linha de progresso no console.
+PROGRESS_INTERVAL = 256
+
+# Verificação opcional: refaz a varredura em série (um único mapa global) e compara com o
+# resultado paralelo. Dobra o tempo de leitura; útil só para validar a mesclagem.
+VERIFICAR_SERIAL = False
+
 # --- Variável Global para Monitoramento ---
-# Estrutura para rastrear o tipo e tamanho/valor máximo de cada campo.
-MAX_FIELD_SIZES = defaultdict(lambda: {'type': 'unknown', 'max_len': 0, 'max_val': -math.inf, 'float_precision': 0})
+# Mapa de dimensionamento no formato "struct-of-arrays": quatro dicts paralelos indexados
+# pelo nome do campo (tipo, tamanho máximo, valor absoluto máximo e precisão decimal).
+# Campos ausentes de um dict assumem os padrões: 'unknown', 0, -inf e 0.
+MapaTamanhos = Tuple[Dict[str, str], Dict[str, int], Dict[str, float], Dict[str, int]]
+
+# Mapa PARCIAL de um arquivo (varredura paralela): o tipo não é travado, pois depende dos arquivos
+# anteriores. Guarda estatísticas brutas por tipo para que 'mesclar_tamanhos' reproduza a varredura serial:
+# (datas, max_lens, max_ints, max_floats, precisoes, primeiros_tipos)
+# - datas: 'date' para os campos em que apareceu uma data (a partir daí o campo é ignorado, como no serial)
+# - max_lens: maior tamanho entre TODAS as strings
+# - max_ints: maior valor absoluto entre os inteiros vistos ANTES do primeiro float do arquivo
+# - max_floats: maior valor absoluto entre os floats com casas decimais (a chave existe se houve qualquer float)
+# - precisoes: maior precisão entre os floats com casas decimais
+# - primeiros_tipos: primeiro tipo (int/float/string) visto antes de uma data
+MapaParcial = Tuple[Dict[str, str], Dict[str, int], Dict[str, int], Dict[str, float], Dict[str, int], Dict[str, str]]
+
+def _novo_mapa(campos_longos: bool = False) -> MapaTamanhos:
+    """ Cria um mapa de dimensionamento (com os campos de texto longo pré-carregados, se pedido). """
+    # Pré-carrega campos de texto longo (TEXT) para garantir que sejam tratados como 'string'.
+    tipos = {field: 'string' for field in FIELDS_TO_KEEP_LONG} if campos_longos else {}
+    return tipos, {}, {}, {}
+
+def _novo_mapa_parcial() -> MapaParcial:
+    """ Cria um mapa parcial vazio (varredura de um arquivo). """
+    return {}, {}, {}, {}, {}, {}
 
-# Pré-carrega campos de texto longo (TEXT) para garantir que sejam tratados como 'string'.
-for field in FIELDS_TO_KEEP_LONG:
-    MAX_FIELD_SIZES[field]['type'] = 'string'
+# Estrutura para rastrear o tipo e tamanho/valor máximo de cada campo.
+FIELD_TYPES, FIELD_MAX_LEN, FIELD_MAX_VAL, FIELD_FLOAT_PRECISION = MAX_FIELD_SIZES = _novo_mapa(campos_longos=True)
     
 # --- Funções Auxiliares de Dimensionamento ---
 
@@ -46,141 +115,291 @@ def limpar_texto(valor: Any) -> Any:
     Rotina de Segurança: Remove espaços extras, quebras de linha, tabs e normaliza espaços.
     Retorna o valor original se não for string, garantindo a preservação do tipo.
     """
+    # Vazios ('' ou None) não têm o que limpar
+    if not valor:
+        return valor
     if isinstance(valor, str):
-        # Substitui quebras de linha/tabs por um único espaço
-        valor = re.sub(r"[\r\n\t]+", " ", valor)
-        # Normaliza múltiplos espaços para um único
-        valor = re.sub(r"\s{2,}", " ", valor)
-        return valor.strip()
+        # split() sem argumentos (em C) já quebra em \r, \n, \t e espaços, descarta as
+        # pontas e colapsa sequências; o join remonta com um único espaço.
+        return " ".join(valor.split())
     return valor 
 
+def _validar_inteiro_str(texto: str) -> Union[int, None]:
+    """ Converte para inteiro uma string já limpa (sem espaços nas pontas). """
+    if not texto:
+        return None
+    # Caminho rápido: só dígitos (com sinal opcional) convertem direto, sem passar pelo float.
+    # isdecimal() (e não isdigit()) aceita exatamente os dígitos que o int() entende.
+    if texto.isdecimal() or (texto[0] in '+-' and texto[1:].isdecimal()):
+        return int(texto)
+    # Verifica se há parte decimal. Se houver, não é um inteiro puro.
+    if '.' in texto:
+        return None
+    try:
+        # Tenta a conversão robusta (float(texto) para lidar com strings como "1e3")
+        return int(float(texto))
+    except (ValueError, OverflowError):
+        return None
+
 def validar_inteiro(valor: Any) -> Union[int, None]:
     """ Tenta converter um valor para inteiro. """
+    if isinstance(valor, str):
+        return _validar_inteiro_str(valor.strip())
     try:
-        if isinstance(valor, str):
-            valor = valor.strip()
-            if not valor:
-                return None
-        # Tenta a conversão robusta (float(valor) para lidar com strings como "1.0")
-        if isinstance(valor, (float, str)):
-             # Verifica se há parte decimal significativa. Se houver, não é um inteiro puro.
-             if isinstance(valor, str) and '.' in valor:
-                 return None
-             if isinstance(valor, float) and valor != int(valor):
-                 return None
-             return int(float(valor))
-
+        if isinstance(valor, float) and valor != int(valor):
+            return None
         return int(valor)
+    except (ValueError, TypeError, OverflowError):
+        return None
 
-    except (ValueError, TypeError):
+def _validar_flutuante_str(texto: str) -> Union[float, None]:
+    """ Converte para flutuante uma string já limpa (sem espaços nas pontas). """
+    if not texto:
+        return None
+    try:
+        return float(texto)
+    except ValueError:
         return None
 
 def validar_flutuante(valor: Any) -> Union[float, None]:
     """ Tenta converter um valor para flutuante (decimal). """
+    if isinstance(valor, str):
+        return _validar_flutuante_str(valor.strip())
     try:
-        if isinstance(valor, str):
-            valor = valor.strip()
-            if not valor:
-                return None
         return float(valor)
     except (ValueError, TypeError):
         return None
 
-def validar_data(valor: Any) -> bool:
-    """ Tenta determinar se o valor é uma string de data válida (apenas para strings). """
-    if not isinstance(valor, str) or not valor.strip():
+def _validar_data_str(texto: str) -> bool:
+    """ Verifica se uma string já limpa (sem espaços nas pontas) é uma data válida. """
+    # Rejeição rápida por tamanho (evita o regex em textos longos como 'ementa')
+    if not _DATE_MIN_LEN <= len(texto) <= _DATE_MAX_LEN:
         return False
-        
-    valor_limpo = valor.strip()
+
     # Verifica se a string corresponde a um padrão de data conhecido
-    for fmt in DATE_FORMATS:
+    for regex, fmt in _DATE_REGEXES:
+        # Só tenta o strptime quando o formato "bate" com o padrão pré-compilado
+        if not regex.match(texto):
+            continue
         try:
-            datetime.strptime(valor_limpo, fmt)
+            datetime.strptime(texto, fmt)
             return True
         except ValueError:
             continue
     return False
 
+def validar_data(valor: Any) -> bool:
+    """ Tenta determinar se o valor é uma string de data válida (apenas para strings). """
+    if not isinstance(valor, str):
+        return False
+    return _validar_data_str(valor.strip())
+
 
-def atualizar_max_size(chave_original: str, valor_tratado: Any, tipo_detectado: str):
-    """ Registra o tamanho/valor máximo encontrado para cada atributo. """
-    global MAX_FIELD_SIZES
+def _precisao_decimal(valor_tratado: float, texto_original: Union[str, None]) -> Union[int, None]:
+    """ Número de casas decimais de um FLOAT (None quando não há '.'), a partir do texto de origem, quando houver. """
+    # Em notação exponencial ("1.5e10") as casas após o '.' não são decimais: usa a representação do float.
+    if texto_original is not None and 'e' not in texto_original and 'E' not in texto_original:
+        valor_str = texto_original
+    else:
+        valor_str = repr(valor_tratado)
+    posicao_ponto = valor_str.find('.')
+    if posicao_ponto == -1:
+        return None
+    return len(valor_str) - posicao_ponto - 1
+
+def atualizar_max_size(chave_original: str, valor_tratado: Any, tipo_detectado: str, tamanhos: MapaTamanhos = None, texto_original: str = None,
+                       _mapa_global: MapaTamanhos = MAX_FIELD_SIZES, _campos_longos: frozenset = FIELDS_TO_KEEP_LONG,
+                       _inf: float = math.inf, _max=max, _abs=abs):
+    """ 
+    Registra o tamanho/valor máximo encontrado para cada atributo.
+    'texto_original' é a string limpa de onde veio um FLOAT (usada para medir a precisão).
+    Os parâmetros com '_' são capturados na definição (acesso local, sem busca em globais).
+    """
+    if tamanhos is None:
+        tamanhos = _mapa_global
+    tipos, max_lens, max_vals, precisoes = tamanhos
     
     # Padroniza a chave 'id' para evitar conflitos com IDs internos do DB
     chave = 'id_origem' if chave_original == 'id' else chave_original
     
     # Se o tipo atual for 'string' ou 'unknown', ele pode ser promovido.
     # Tipos numéricos ou data NÃO podem ser rebaixados para 'string' (exceto por TEXT longo predefinido).
-    tipo_atual = MAX_FIELD_SIZES[chave]['type']
+    tipo_atual = tipos.get(chave, 'unknown')
     
-    if chave in FIELDS_TO_KEEP_LONG:
+    if chave in _campos_longos:
         # Campos longos pré-definidos são sempre strings (TEXT)
         pass 
     elif tipo_detectado == 'date':
         # Se detectarmos uma data, definimos como 'date'.
-        MAX_FIELD_SIZES[chave]['type'] = 'date'
+        tipos[chave] = 'date'
     elif tipo_detectado == 'float' and tipo_atual in ('unknown', 'int', 'float'):
         # Se for float, promovemos de int/unknown para float
-        MAX_FIELD_SIZES[chave]['type'] = 'float'
+        tipos[chave] = 'float'
         
         # Rastreia a precisão (número de casas decimais)
-        valor_str = str(valor_tratado)
-        if '.' in valor_str:
-            precisao = len(valor_str.split('.')[-1])
-            MAX_FIELD_SIZES[chave]['float_precision'] = max(MAX_FIELD_SIZES[chave]['float_precision'], precisao)
-            MAX_FIELD_SIZES[chave]['max_val'] = max(MAX_FIELD_SIZES[chave]['max_val'], abs(valor_tratado))
+        precisao = _precisao_decimal(valor_tratado, texto_original)
+        if precisao is not None:
+            precisoes[chave] = _max(precisoes.get(chave, 0), precisao)
+            max_vals[chave] = _max(max_vals.get(chave, -_inf), _abs(valor_tratado))
 
     elif tipo_detectado == 'int' and tipo_atual in ('unknown', 'int'):
         # Se for int e não for float/date ainda, mantemos como int
-        MAX_FIELD_SIZES[chave]['type'] = 'int'
-        MAX_FIELD_SIZES[chave]['max_val'] = max(MAX_FIELD_SIZES[chave]['max_val'], abs(valor_tratado))
+        tipos[chave] = 'int'
+        max_vals[chave] = _max(max_vals.get(chave, -_inf), _abs(valor_tratado))
 
     elif tipo_detectado == 'string' and tipo_atual in ('unknown', 'string'):
         # Se for string (e não foi promovido para tipo mais específico)
-        MAX_FIELD_SIZES[chave]['type'] = 'string'
-        tamanho = len(valor_tratado)
-        MAX_FIELD_SIZES[chave]['max_len'] = max(MAX_FIELD_SIZES[chave]['max_len'], tamanho)
+        tipos[chave] = 'string'
+        max_lens[chave] = _max(max_lens.get(chave, 0), len(valor_tratado))
 
     # Note: Tipos mistos (ex: campo que às vezes é int, às vezes string) serão resolvidos pela ordem de detecção.
     # Se um campo for INT e depois STRING, ele será STRING (exceto se for TEXT longo predefinido).
     # Se um campo for INT e depois FLOAT, ele será FLOAT.
 
-def tratar_dados_apenas_para_validacao(dados: Dict[str, Any]):
+def registrar_parcial(chave_original: str, valor_tratado: Any, tipo_detectado: str, tamanhos: MapaParcial, texto_original: str = None,
+                      _campos_longos: frozenset = FIELDS_TO_KEEP_LONG, _inf: float = math.inf, _max=max, _abs=abs):
+    """ 
+    Equivalente de 'atualizar_max_size' para o mapa PARCIAL de um arquivo: registra as estatísticas
+    brutas do valor, sem travar o tipo (a promoção é refeita na mesclagem).
+    """
+    datas, max_lens, max_ints, max_floats, precisoes, primeiros = tamanhos
+    chave = 'id_origem' if chave_original == 'id' else chave_original
+
+    # Campos longos e campos já com data: ignorados (como em 'atualizar_max_size', que não sai de DATE)
+    if chave in _campos_longos or chave in datas:
+        return
+    if tipo_detectado == 'date':
+        datas[chave] = 'date'
+        return
+    if chave not in primeiros:
+        primeiros[chave] = tipo_detectado
+
+    if tipo_detectado == 'string':
+        max_lens[chave] = _max(max_lens.get(chave, 0), len(valor_tratado))
+    elif tipo_detectado == 'int':
+        # Depois de um float o campo seria FLOAT, e inteiros não contam mais no valor máximo
+        if chave not in max_floats:
+            max_ints[chave] = _max(max_ints.get(chave, -_inf), _abs(valor_tratado))
+    elif tipo_detectado == 'float':
+        max_float = max_floats.setdefault(chave, -_inf)
+        precisao = _precisao_decimal(valor_tratado, texto_original)
+        if precisao is not None:
+            precisoes[chave] = _max(precisoes.get(chave, 0), precisao)
+            max_floats[chave] = _max(max_float, _abs(valor_tratado))
+
+def tratar_dados_apenas_para_validacao(dados: Dict[str, Any], tamanhos: MapaTamanhos = None, parcial: bool = False):
     """ 
     Rotina de Dimensionamento: Percorre o registro e atualiza o tamanho máximo encontrado
     para cada campo, agora com heurísticas para INT, FLOAT e DATE.
+    Com 'parcial', 'tamanhos' é um MapaParcial (estatísticas brutas de um arquivo).
     """
+    if tamanhos is None:
+        tamanhos = MAX_FIELD_SIZES
+    # No mapa parcial, o primeiro dict marca só as datas (o que basta para ignorar o campo, como abaixo)
+    tipos = tamanhos[0]
+
+    # Nomes locais (leitura mais rápida que a de globais no laço executado para todo campo)
+    atualizar = registrar_parcial if parcial else atualizar_max_size
+    inteiro_str = _validar_inteiro_str
+    flutuante_str = _validar_flutuante_str
+    data_str = _validar_data_str
+    tipo_do_campo = tipos.get
+    campos_longos = FIELDS_TO_KEEP_LONG
+
     for chave, valor in dados.items():
-        # Ignora listas ou objetos aninhados (o relatório de DDL não os dimensiona diretamente)
-        if isinstance(valor, (list, dict)):
-            continue 
+        # Campos "travados": TEXT longo e DATE não mudam mais, qualquer valor é ignorado.
+        # (Um campo STRING não pode ser travado: uma data ainda o promove e valores numéricos
+        # não devem contar no tamanho, então eles continuam passando pelas validações.)
+        if chave in campos_longos or tipo_do_campo(chave) == 'date':
+            continue
+
+        # Despacho único pelo tipo do valor (evita isinstance repetidos nas validações)
+        tipo = type(valor)
+
+        # 1. Numéricos nativos do JSON (booleanos contam como INT 0/1)
+        if tipo is int or tipo is bool:
+            atualizar(chave, int(valor), 'int', tamanhos)
+            continue
+        if tipo is float:
+            if valor.is_integer():
+                atualizar(chave, int(valor), 'int', tamanhos)
+            else:
+                atualizar(chave, valor, 'float', tamanhos)
+            continue
 
-        valor_limpo = limpar_texto(valor)
+        # Ignora None, listas ou objetos aninhados (o relatório de DDL não os dimensiona diretamente)
+        if tipo is not str:
+            continue
+
+        # Mesma normalização de limpar_texto, feita em linha (o valor já é str)
+        valor_limpo = " ".join(valor.split())
+
+        # Vazio: não é número nem data, vai direto como STRING de tamanho 0 (sem as validações)
+        if not valor_limpo:
+            atualizar(chave, valor_limpo, 'string', tamanhos)
+            continue
         
-        # 1. Tenta tratar como INT
-        valor_numerico = validar_inteiro(valor_limpo)
+        # 2. Tenta tratar como INT (o caso mais comum, só dígitos, é resolvido em linha)
+        if valor_limpo.isdecimal():
+            atualizar(chave, int(valor_limpo), 'int', tamanhos)
+            continue
+        valor_numerico = inteiro_str(valor_limpo)
         if valor_numerico is not None:
-            atualizar_max_size(chave, valor_numerico, 'int')
+            atualizar(chave, valor_numerico, 'int', tamanhos)
             continue 
 
-        # 2. Tenta tratar como FLOAT (após falhar como INT)
-        valor_flutuante = validar_flutuante(valor_limpo)
+        # 3. Tenta tratar como FLOAT (após falhar como INT)
+        valor_flutuante = flutuante_str(valor_limpo)
         if valor_flutuante is not None:
-            atualizar_max_size(chave, valor_flutuante, 'float')
+            atualizar(chave, valor_flutuante, 'float', tamanhos, valor_limpo)
             continue
 
-        # 3. Tenta tratar como DATE (após falhar como número)
-        if validar_data(valor_limpo):
-            atualizar_max_size(chave, valor_limpo, 'date')
+        # 4. Tenta tratar como DATE (após falhar como número)
+        if data_str(valor_limpo):
+            atualizar(chave, valor_limpo, 'date', tamanhos)
             continue
 
-        # 4. Tratamento Padrão (Tudo o que restou é tratado como STRING)
-        if isinstance(valor_limpo, str):
-            atualizar_max_size(chave, valor_limpo, 'string')
-        elif isinstance(valor_limpo, (bool)):
-            # Converte booleanos para string para fins de dimensionamento de tamanho
-            atualizar_max_size(chave, str(valor_limpo), 'string')
-        # Note: Valores None continuam sendo ignorados e não afetam o dimensionamento.
+        # 5. Tratamento Padrão (Tudo o que restou é tratado como STRING)
+        atualizar(chave, valor_limpo, 'string', tamanhos)
+
+def mesclar_tamanhos(parcial: MapaParcial, destino: MapaTamanhos):
+    """ 
+    Rotina de Redução: Incorpora o mapa parcial de um arquivo ao mapa global, refazendo as
+    promoções de tipo de 'atualizar_max_size': o resultado é o mesmo da varredura serial.
+    """
+    tipos, max_lens, max_vals, precisoes = destino
+    p_datas, p_max_lens, p_max_ints, p_max_floats, p_precisoes, p_primeiros = parcial
+
+    for chave in p_primeiros.keys() | p_datas.keys():
+        tipo_atual = tipos.get(chave, 'unknown')
+        if chave in FIELDS_TO_KEEP_LONG or tipo_atual == 'date':
+            # Campos travados: ignorados na varredura serial
+            continue
+
+        # Um campo ainda sem tipo assume o primeiro tipo visto no arquivo
+        if tipo_atual == 'unknown':
+            tipo_atual = p_primeiros.get(chave, 'unknown')
+
+        if tipo_atual == 'string':
+            if chave in p_max_lens:
+                max_lens[chave] = max(max_lens.get(chave, 0), p_max_lens[chave])
+        elif tipo_atual in ('int', 'float'):
+            # INT: contam os inteiros até o primeiro float do arquivo, que promove o campo a FLOAT
+            if tipo_atual == 'int':
+                if chave in p_max_ints:
+                    max_vals[chave] = max(max_vals.get(chave, -math.inf), p_max_ints[chave])
+                if chave in p_max_floats:
+                    tipo_atual = 'float'
+            # FLOAT: só os floats com casas decimais contam (inteiros são ignorados)
+            if tipo_atual == 'float' and chave in p_precisoes:
+                precisoes[chave] = max(precisoes.get(chave, 0), p_precisoes[chave])
+                max_vals[chave] = max(max_vals.get(chave, -math.inf), p_max_floats[chave])
+
+        # Uma data no arquivo trava o campo como DATE (depois das atualizações anteriores a ela)
+        if chave in p_datas:
+            tipo_atual = 'date'
+        if tipo_atual != 'unknown':
+            tipos[chave] = tipo_atual
 
 # --- Funções de Relatório e Estatísticas ---
 
@@ -193,8 +412,8 @@ def gerar_relatorio_final(estatisticas: Dict[str, int]):
     
     # Filtra apenas chaves válidas (que apareceram ou que são TEXT longo predefinido)
     valid_keys = {
-        k: v for k, v in MAX_FIELD_SIZES.items() 
-        if v['type'] != 'unknown' or k in FIELDS_TO_KEEP_LONG
+        k: tipo for k, tipo in FIELD_TYPES.items() 
+        if tipo != 'unknown' or k in FIELDS_TO_KEEP_LONG
     }
     
     if not valid_keys:
@@ -202,48 +421,49 @@ def gerar_relatorio_final(estatisticas: Dict[str, int]):
         return
         
     try:
-        with open(RELATORIO_FILE, "w", encoding="utf-8") as f:
-            f.write("##########################################################\n")
-            f.write("### RELATÓRIO DE DIMENSIONAMENTO E INVENTÁRIO (Aprimorado) ###\n")
-            f.write("##########################################################\n")
-            f.write(f"Data/Hora: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
-            f.write("==========================================================\n")
-            f.write("### ESTATÍSTICAS DE PROCESSAMENTO GERAL\n")
-            f.write(f"Total de Pastas Lidas: {estatisticas['pastas_lidas']}\n")
-            f.write(f"Total de Arquivos JSON Encontrados: {estatisticas['arquivos_encontrados']}\n")
-            f.write("----------------------------------------------------------\n")
-            f.write("### INVENTÁRIO DE DADOS DISPONÍVEIS NO DISCO\n")
-            f.write(f"TOTAL DE REGISTROS (OBJETOS) DISPONÍVEIS PARA PROCESSAMENTO: {total_registros_disponiveis} registros\n")
-            f.write("==========================================================\n")
-            f.write("### DIMENSIONAMENTO DE CAMPO (DDL BRUTO SUGERIDO)\n")
-            f.write("{:<30} | {:<10} | {:<20}\n".format("ATRIBUTO (DB)", "TIPO DETECTADO", "TAMANHO MÁXIMO/VALOR"))
-            f.write("----------------------------------------------------------\n")
+        with open(RELATORIO_FILE, "w", encoding="utf-8", buffering=IO_BUFFER_SIZE) as f:
+            # O relatório é montado em memória e gravado com uma única escrita
+            linhas = []
+            linhas.append("##########################################################\n")
+            linhas.append("### RELATÓRIO DE DIMENSIONAMENTO E INVENTÁRIO (Aprimorado) ###\n")
+            linhas.append("##########################################################\n")
+            linhas.append(f"Data/Hora: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
+            linhas.append("==========================================================\n")
+            linhas.append("### ESTATÍSTICAS DE PROCESSAMENTO GERAL\n")
+            linhas.append(f"Total de Pastas Lidas: {estatisticas['pastas_lidas']}\n")
+            linhas.append(f"Total de Arquivos JSON Encontrados: {estatisticas['arquivos_encontrados']}\n")
+            linhas.append("----------------------------------------------------------\n")
+            linhas.append("### INVENTÁRIO DE DADOS DISPONÍVEIS NO DISCO\n")
+            linhas.append(f"TOTAL DE REGISTROS (OBJETOS) DISPONÍVEIS PARA PROCESSAMENTO: {total_registros_disponiveis} registros\n")
+            linhas.append("==========================================================\n")
+            linhas.append("### DIMENSIONAMENTO DE CAMPO (DDL BRUTO SUGERIDO)\n")
+            linhas.append("{:<30} | {:<10} | {:<20}\n".format("ATRIBUTO (DB)", "TIPO DETECTADO", "TAMANHO MÁXIMO/VALOR"))
+            linhas.append("----------------------------------------------------------\n")
             
-            for chave, dados in sorted(valid_keys.items()):
-                tipo = dados.get('type', 'unknown')
+            for chave, tipo in sorted(valid_keys.items()):
                 is_long_field = chave in FIELDS_TO_KEEP_LONG
-                max_len = dados.get('max_len', 'N/A')
-                max_val = dados.get('max_val', 'N/A')
+                max_len = FIELD_MAX_LEN.get(chave, 0)
+                max_val = FIELD_MAX_VAL.get(chave, -math.inf)
                 
                 # --- Lógica de Sugestão DDL ---
 
-                if is_long_field or (tipo == 'string' and dados['max_len'] > 255):
+                if is_long_field or (tipo == 'string' and max_len > 255):
                     # Tipo TEXT ou Longo Predefinido
                     sugestao = "TEXT"
                     if is_long_field:
                         sugestao += " (Texto Longo Predefinido)"
-                    f.write("{:<30} | {:<10} | {:<20} (Sugestão: {})\n".format(
+                    linhas.append("{:<30} | {:<10} | {:<20} (Sugestão: {})\n".format(
                         chave, 'STRING', max_len, sugestao))
                 
                 elif tipo == 'date':
                     # Tipo DATE
                     sugestao = "DATE ou TIMESTAMP"
-                    f.write("{:<30} | {:<10} | {:<20} (Sugestão: {})\n".format(
+                    linhas.append("{:<30} | {:<10} | {:<20} (Sugestão: {})\n".format(
                         chave, 'DATE', 'N/A', sugestao))
                         
                 elif tipo == 'float':
                     # Tipo FLOAT / NUMERIC
-                    precisao = dados['float_precision']
+                    precisao = FIELD_FLOAT_PRECISION.get(chave, 0)
                     # Total de dígitos (antes e depois do ponto)
                     total_digitos = len(str(int(max_val))) + precisao
                     
@@ -254,12 +474,11 @@ def gerar_relatorio_final(estatisticas: Dict[str, int]):
                         sugestao = "FLOAT8 (ou REAL/DOUBLE PRECISION)"
                         
                     max_val_display = f"Abs: {max_val} (Precisão: {precisao})"
-                    f.write("{:<30} | {:<10} | {:<20} (Sugestão: {})\n".format(
+                    linhas.append("{:<30} | {:<10} | {:<20} (Sugestão: {})\n".format(
                         chave, 'FLOAT', max_val_display, sugestao))
                         
                 elif tipo == 'int':
                     # Tipo INT (Baseado no valor máximo encontrado)
-                    max_val = dados['max_val']
                     if max_val == -math.inf: # Caso onde o campo foi detectado, mas todos os valores eram nulos
                         sugestao = "INTEGER (Sem Amostra Válida)"
                     elif max_val <= 32767:
@@ -269,12 +488,11 @@ def gerar_relatorio_final(estatisticas: Dict[str, int]):
                     else:
                         sugestao = "BIGINT"
                         
-                    f.write("{:<30} | {:<10} | {:<20} (Sugestão: {})\n".format(
+                    linhas.append("{:<30} | {:<10} | {:<20} (Sugestão: {})\n".format(
                         chave, 'INT', max_val, sugestao))
                 
                 elif tipo == 'string':
                     # Tipo VARCHAR (Tamanho ajustado com margem de segurança)
-                    max_len = dados['max_len']
                     if max_len == 0:
                         max_len_display = f"0 (Default {DEFAULT_VARCHAR_SIZE})"
                         sugestao = f"VARCHAR({DEFAULT_VARCHAR_SIZE})"
@@ -294,22 +512,122 @@ def gerar_relatorio_final(estatisticas: Dict[str, int]):
                         sugestao = f"VARCHAR({arredondado})"
                         max_len_display = max_len
                         
-                    f.write("{:<30} | {:<10} | {:<20} (Sugestão: {})\n".format(
+                    linhas.append("{:<30} | {:<10} | {:<20} (Sugestão: {})\n".format(
                         chave, 'STRING', max_len_display, sugestao))
                         
                 elif tipo == 'unknown':
                     # Chaves que apareceram, mas nunca receberam um valor válido (ex: sempre nulo)
                     sugestao = f"VARCHAR({DEFAULT_VARCHAR_SIZE}) (Chave sem Amostra)"
-                    f.write("{:<30} | {:<10} | {:<20} (Sugestão: {})\n".format(
+                    linhas.append("{:<30} | {:<10} | {:<20} (Sugestão: {})\n".format(
                         chave, 'UNKNOWN', 'N/A', sugestao))
 
-            f.write("----------------------------------------------------------\n")
+            linhas.append("----------------------------------------------------------\n")
+            f.write("".join(linhas))
             print(f"\n[SUCESSO] Relatório de dimensionamento e estatísticas salvo em: {RELATORIO_FILE}")
             
     except Exception as e:
         print(f"\nErro ao gerar o relatório de dimensionamento: {e}", file=sys.stderr)
 
-# --- Função de Validação Principal (Sem Alterações Funcionais) ---
+# --- Varredura de Arquivo (executada nos processos de trabalho) ---
+
+def dimensionar_registros(registros: Iterable[Dict[str, Any]], tamanhos: MapaTamanhos, parcial: bool = True) -> int:
+    """ Dimensiona cada registro no mapa informado e retorna o total de registros lidos. """
+    total_registros = 0
+
+    # Nome local para o laço por registro
+    tratar = tratar_dados_apenas_para_validacao
+
+    # As chaves entram no mapa na primeira atualização válida (campos sempre nulos ficariam
+    # 'unknown' e são descartados no relatório de qualquer forma)
+    for elemento in registros:
+        # A contagem de inventário é a primeira ação (não depende do sucesso do tratamento)
+        total_registros += 1
+
+        # Atualiza o dimensionamento do campo
+        tratar(elemento, tamanhos, parcial)
+
+    return total_registros
+
+def escanear_arquivo(caminho_arquivo: str, tamanhos: MapaTamanhos = None) -> Tuple[MapaParcial, int, Union[str, None]]:
+    """
+    Lê um arquivo JSON e dimensiona seus registros em um mapa local (parcial).
+    Com 'tamanhos', dimensiona em série nesse mapa (tipo travado, como no mapa global).
+    Retorna o mapa, o total de registros e a mensagem de erro (ou None).
+    """
+    parcial = tamanhos is None
+    if parcial:
+        tamanhos = _novo_mapa_parcial()
+
+    try:
+        # Rotina de segurança: Abrindo e carregando JSON
+        with open(caminho_arquivo, "rb", buffering=IO_BUFFER_SIZE) as f:
+            if ijson is not None and f.peek(64).lstrip()[:1] == b"[":
+                # Lista de registros: processa um registro por vez, à medida que é lido
+                registros = ijson.items(f, "item", use_float=True)
+                total_registros = dimensionar_registros(registros, tamanhos, parcial)
+            else:
+                # Modo binário: o parser decodifica o UTF-8 de uma só vez
+                dados = _json_loads(f.read())
+
+                registros = []
+                if isinstance(dados, list):
+                    registros = dados
+                elif isinstance(dados, dict):
+                    registros = [dados]
+                # Formatos inválidos são ignorados (lista vazia), mas a varredura continua
+
+                total_registros = dimensionar_registros(registros, tamanhos, parcial)
+
+    except _JSON_ERRORS as e:
+        # Rotina de segurança: Erro no formato JSON
+        return _novo_mapa_parcial(), 0, f"\n[ERRO GRAVE] Falha no formato JSON do arquivo {caminho_arquivo}: {e}"
+    except Exception as e:
+        # Rotina de segurança: Erro de I/O, permissão, etc.
+        return _novo_mapa_parcial(), 0, f"\n[ERRO CRÍTICO] Falha ao processar arquivo {caminho_arquivo}: {e}"
+
+    return tamanhos, total_registros, None
+
+def verificar_equivalencia_serial(arquivos_json: List[str]) -> bool:
+    """ Refaz a varredura em série, na mesma ordem de arquivos, e compara com o mapa global (paralelo). """
+    mapa_serial = _novo_mapa(campos_longos=True)
+    for caminho_arquivo in arquivos_json:
+        escanear_arquivo(caminho_arquivo, mapa_serial)
+    if mapa_serial == MAX_FIELD_SIZES:
+        print("[VERIFICAÇÃO] Varredura paralela idêntica à varredura serial.")
+        return True
+    for chave in sorted(set(mapa_serial[0]) | set(FIELD_TYPES)):
+        serial = tuple(mapa.get(chave) for mapa in mapa_serial)
+        paralelo = tuple(mapa.get(chave) for mapa in MAX_FIELD_SIZES)
+        if serial != paralelo:
+            print(f"[VERIFICAÇÃO] Divergência em '{chave}': serial {serial} / paralelo {paralelo}", file=sys.stderr)
+    return False
+
+# --- Coleta de Arquivos ---
+
+def listar_arquivos_json(pasta: str, estatisticas: Dict[str, int]) -> List[str]:
+    """
+    Percorre a pasta (e subpastas) com os.scandir, sem recursão, e retorna os caminhos
+    dos arquivos JSON. Cada pasta lida é contada em estatisticas['pastas_lidas'].
+    """
+    arquivos_json = []
+    pendentes = [pasta]
+    while pendentes:
+        diretorio = pendentes.pop()
+        try:
+            with os.scandir(diretorio) as entradas:
+                estatisticas['pastas_lidas'] += 1
+                for entrada in entradas:
+                    # DirEntry já traz o tipo (sem stat extra) e o caminho completo (sem join)
+                    if entrada.is_dir(follow_symlinks=False):
+                        pendentes.append(entrada.path)
+                    elif entrada.name.endswith(".json"):
+                        arquivos_json.append(entrada.path)
+        except OSError as e:
+            # Rotina de segurança: pasta sem permissão ou removida durante a varredura
+            print(f"\n[AVISO] Não foi possível ler a pasta {diretorio}: {e}", file=sys.stderr)
+    return arquivos_json
+
+# --- Função de Validação Principal ---
 # Apenas a lógica de escaneamento de arquivos é mantida, chamando a rotina aprimorada.
 
 def validar_dimensionamento(pasta: str):
@@ -324,60 +642,35 @@ def validar_dimensionamento(pasta: str):
         'iteracoes_processadas': 0, # Total de todos os registros (contagem de inventário)
     }
     
-    # Conjunto para rastrear chaves totais encontradas no disco
-    chaves_totais = set(MAX_FIELD_SIZES.keys()) 
-
     print("Iniciando varredura e validação de dimensionamento robusto...")
     
-    for raiz, _, arquivos in os.walk(pasta):
-        estatisticas['pastas_lidas'] += 1 
-        
-        for arquivo in arquivos:
-            if arquivo.endswith(".json"):
-                caminho_arquivo = os.path.join(raiz, arquivo)
-                estatisticas['arquivos_encontrados'] += 1
-                
-                # Exibe o progresso no console
+    # 1. Coleta a lista de arquivos (a leitura e o dimensionamento são feitos em paralelo)
+    arquivos_json = listar_arquivos_json(pasta, estatisticas)
+
+    # 2. Map: cada processo escaneia seus arquivos em um mapa local.
+    # Reduce: os mapas parciais são mesclados na ordem dos arquivos.
+    with ProcessPoolExecutor() as executor:
+        resultados = executor.map(escanear_arquivo, arquivos_json, chunksize=SCAN_CHUNKSIZE)
+        for caminho_arquivo, (parcial, total_registros, erro) in zip(arquivos_json, resultados):
+            estatisticas['arquivos_encontrados'] += 1
+            
+            # Exibe o progresso no console (a cada PROGRESS_INTERVAL arquivos, para poupar syscalls)
+            if estatisticas['arquivos_encontrados'] % PROGRESS_INTERVAL == 0:
                 sys.stdout.write(f"\rEscaneando arquivo: {os.path.basename(caminho_arquivo):<50} | Registros processados: {estatisticas['iteracoes_processadas']:,}")
+                # O flush é necessário: a linha termina em '\r' e não seria exibida até o próximo '\n'
                 sys.stdout.flush()
 
-                try:
-                    # Rotina de segurança: Abrindo e carregando JSON
-                    with open(caminho_arquivo, "r", encoding="utf-8") as f:
-                        dados = json.load(f)
+            if erro:
+                print(erro, file=sys.stderr)
+                continue
 
-                    registros = []
-                    if isinstance(dados, list):
-                        registros = dados
-                    elif isinstance(dados, dict):
-                        registros = [dados]
-                    else:
-                        # Ignora formatos inválidos, mas continua
-                        continue
-
-                    for elemento in registros:
-                        # A contagem de inventário é a primeira ação (não depende do sucesso do tratamento)
-                        estatisticas['iteracoes_processadas'] += 1 
-                        
-                        # Rotina de segurança: Identifica novas chaves no registro
-                        for chave in elemento.keys():
-                            chave_no_mapa = 'id_origem' if chave == 'id' else chave
-                            if chave_no_mapa not in chaves_totais:
-                                # Inicializa a chave com 'unknown'
-                                MAX_FIELD_SIZES[chave_no_mapa]['type'] = 'unknown' 
-                                chaves_totais.add(chave_no_mapa)
-
-                        # Atualiza o dimensionamento do campo
-                        tratar_dados_apenas_para_validacao(elemento)
-
-                except json.JSONDecodeError as e:
-                    # Rotina de segurança: Erro no formato JSON
-                    print(f"\n[ERRO GRAVE] Falha no formato JSON do arquivo {caminho_arquivo}: {e}", file=sys.stderr)
-                except Exception as e:
-                    # Rotina de segurança: Erro de I/O, permissão, etc.
-                    print(f"\n[ERRO CRÍTICO] Falha ao processar arquivo {caminho_arquivo}: {e}", file=sys.stderr)
+            estatisticas['iteracoes_processadas'] += total_registros
+            mesclar_tamanhos(parcial, MAX_FIELD_SIZES)
 
     print(f"\rVarredura concluída. Total de arquivos JSON escaneados: {estatisticas['arquivos_encontrados']}. {' ' * 20}")
+
+    if VERIFICAR_SERIAL:
+        verificar_equivalencia_serial(arquivos_json)
     
     if estatisticas['arquivos_encontrados'] > 0:
         gerar_relatorio_final(estatisticas)
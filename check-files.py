@@ -4,8 +4,25 @@ import re
 import sys 
 from datetime import datetime
 import math 
-from collections import defaultdict
-from typing import Dict, Any, List, Tuple, Union
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Any, Iterable, Iterator, List, Tuple, Union
+
+# Parser JSON: usa o orjson (bem mais rápido) quando disponível, senão o json padrão.
+# Ambos recebem bytes; orjson.JSONDecodeError é subclasse de json.JSONDecodeError.
+try:
+    import orjson
+    _json_loads = orjson.loads
+except ImportError:
+    _json_loads = json.loads
+
+# Leitura em fluxo (ijson) para arquivos com uma lista de registros: evita carregar o
+# arquivo inteiro na memória. Opcional: sem o ijson, todo arquivo é lido de uma vez.
+_JSON_ERRORS: Tuple[type, ...] = (json.JSONDecodeError,)
+try:
+    import ijson
+    _JSON_ERRORS += (ijson.JSONError,)
+except ImportError:
+    ijson = None
 
 # --- Configurações ---
 # Arquivo de saída para o relatório de dimensionamento e estatísticas.
@@ -23,13 +40,41 @@ FIELDS_TO_KEEP_LONG = [
 # Tamanho VARCHAR padrão para campos que apareceram, mas que tinham valor vazio ('').
 DEFAULT_VARCHAR_SIZE = 50 
 
+# Padrão de limpeza de texto (compilado uma única vez na carga do módulo).
+# Qualquer sequência de espaços, quebras de linha ou tabs vira um único espaço.
+_RE_WS = re.compile(r"\s+")
+
+# Detecta o que _RE_WS alteraria no meio do texto: qualquer espaço em branco que não seja o ' '
+# (\n, \t, \x0b, NBSP, \u2028...) ou dois espaços seguidos. Sem ocorrência, basta o strip().
+_RE_WS_A_LIMPAR = re.compile(r"[^\S ]|  ")
+
+# Quantidade de arquivos entregue de uma vez a cada processo de trabalho na varredura paralela.
+SCAN_CHUNKSIZE = 64
+
+# Intervalo (em arquivos) entre as atualizações da linha de progresso no console.
+PROGRESS_INTERVAL = 64
+
+# Verificação opcional: refaz a varredura em série (um único mapa global) e compara com o
+# resultado paralelo. Dobra o tempo de leitura; útil só para validar a mesclagem.
+VERIFICAR_SERIAL = False
+
 # --- Variável Global para Monitoramento ---
-# Estrutura para rastrear o tipo e tamanho/valor máximo de cada campo.
-MAX_FIELD_SIZES = defaultdict(lambda: {'type': 'unknown', 'max_len': 0, 'max_val': -math.inf})
+# Mapa de dimensionamento no formato "struct-of-arrays": três dicts paralelos indexados
+# pelo nome do campo (tipo, tamanho máximo e valor absoluto máximo).
+# Campos ausentes de um dict assumem os padrões: 'unknown', 0 e -inf.
+# Um mapa PARCIAL (de um arquivo, na varredura paralela) tem o mesmo formato, mas não trava o tipo:
+# guarda o primeiro tipo visto e os máximos de TODOS os valores string e int, para que 'mesclar_tamanhos'
+# reproduza exatamente a varredura serial (onde o tipo travado depende dos arquivos anteriores).
+MapaTamanhos = Tuple[Dict[str, str], Dict[str, int], Dict[str, int]]
+
+def _novo_mapa(campos_longos: bool = False) -> MapaTamanhos:
+    """ Cria um mapa de dimensionamento (com os campos de texto longo pré-carregados, se pedido). """
+    # Pré-carrega campos de texto longo (TEXT) para garantir que sejam tratados como 'string'.
+    tipos = {field: 'string' for field in FIELDS_TO_KEEP_LONG} if campos_longos else {}
+    return tipos, {}, {}
 
-# Pré-carrega campos de texto longo (TEXT) para garantir que sejam tratados como 'string'.
-for field in FIELDS_TO_KEEP_LONG:
-    MAX_FIELD_SIZES[field]['type'] = 'string'
+# Estrutura para rastrear o tipo e tamanho/valor máximo de cada campo.
+FIELD_TYPES, FIELD_MAX_LEN, FIELD_MAX_VAL = MAX_FIELD_SIZES = _novo_mapa(campos_longos=True)
     
 # --- Funções Auxiliares de Dimensionamento ---
 
@@ -39,84 +84,164 @@ def limpar_texto(valor: Any) -> Any:
     Retorna o valor original se não for string, garantindo a preservação do tipo.
     """
     if isinstance(valor, str):
-        # Substitui quebras de linha/tabs por um único espaço
-        valor = re.sub(r"[\r\n\t]+", " ", valor)
-        # Normaliza múltiplos espaços para um único
-        valor = re.sub(r"\s{2,}", " ", valor)
-        return valor.strip()
+        # Atalho: texto já limpo (caso mais comum) dispensa a substituição por regex
+        if not _RE_WS_A_LIMPAR.search(valor):
+            return valor.strip()
+        # Substitui quebras de linha/tabs e espaços múltiplos por um único espaço (uma só passada)
+        return _RE_WS.sub(" ", valor).strip()
     return valor 
 
+# Cache da heurística de nome ("numero"/"id") por chave: o conjunto de chaves do STJ é pequeno
+# e se repete em todos os registros, então o lower() e as buscas ocorrem uma vez por chave.
+_NUMERIC_KEY_CACHE: Dict[str, bool] = {}
+
+def _chave_numerica(chave: str) -> bool:
+    """ Indica se o nome da chave sugere um campo numérico (contém 'numero' ou 'id'). """
+    numerica = _NUMERIC_KEY_CACHE.get(chave)
+    if numerica is None:
+        chave_lower = chave.lower()
+        numerica = "numero" in chave_lower or "id" in chave_lower
+        _NUMERIC_KEY_CACHE[chave] = numerica
+    return numerica
+
 def validar_inteiro(valor: Any) -> Union[int, None]:
     """ 
     Rotina de Validação de Tamanho: Tenta converter um valor para inteiro.
     Isto é usado APENAS para determinar se um campo numérico cabe em um SMALLINT, INTEGER ou BIGINT.
     Não adapta strings arbitrárias (como datas) para int.
     """
+    if isinstance(valor, str):
+        valor = valor.strip()
+        if not valor:
+            return None
+        # Caminho rápido: só dígitos (com sinal opcional) convertem direto, sem float nem exceção.
+        # isdecimal() (e não isdigit()) aceita exatamente os dígitos que o int() entende.
+        if valor.isdecimal() or (valor[0] in '+-' and valor[1:].isdecimal()):
+            return int(valor)
+        # Só vale tentar o float (ex: "1.0", "1e3") se houver ponto ou expoente;
+        # textos como "PROCESSO-123" são descartados sem lançar exceção.
+        if '.' not in valor and 'e' not in valor and 'E' not in valor:
+            return None
+
     try:
-        if isinstance(valor, str):
-            valor = valor.strip()
-            if not valor:
-                return None
-        
         # Tenta a conversão robusta (float(valor) para lidar com strings como "1.0")
         if isinstance(valor, (float, str)):
              return int(float(valor))
 
         return int(valor)
 
-    except (ValueError, TypeError):
+    except (ValueError, TypeError, OverflowError):
         # Em caso de falha (ex: string "texto"), retorna None, e o campo será tratado como string
         return None
 
-def atualizar_max_size(chave_original: str, valor_tratado: Any):
-    """ Registra o tamanho/valor máximo encontrado para cada atributo. """
-    global MAX_FIELD_SIZES
+def atualizar_max_size(chave_original: str, valor_tratado: Any, tamanhos: MapaTamanhos = None, parcial: bool = False):
+    """ 
+    Registra o tamanho/valor máximo encontrado para cada atributo.
+    Sem 'tamanhos', atualiza o mapa global MAX_FIELD_SIZES. Com 'parcial', o tipo não é travado.
+    """
+    tipos, max_lens, max_vals = MAX_FIELD_SIZES if tamanhos is None else tamanhos
     
     # Padroniza a chave 'id' para evitar conflitos com IDs internos do DB
     chave = 'id_origem' if chave_original == 'id' else chave_original
     
     if isinstance(valor_tratado, str):
+        # Caminho de string: só lê 'tipos' e 'max_lens'
+        tipo_atual = tipos.get(chave, 'unknown')
+        if tipo_atual == 'unknown':
+            tipos[chave] = 'string'
+        elif tipo_atual != 'string' and not parcial:
+            return
+        # Só grava quando o tamanho realmente aumenta
         tamanho = len(valor_tratado)
-        if MAX_FIELD_SIZES[chave]['type'] in ('unknown', 'string'):
-            MAX_FIELD_SIZES[chave]['type'] = 'string'
-            MAX_FIELD_SIZES[chave]['max_len'] = max(MAX_FIELD_SIZES[chave]['max_len'], tamanho)
+        if tamanho > max_lens.get(chave, 0):
+            max_lens[chave] = tamanho
 
     elif isinstance(valor_tratado, int):
         # Rastreamos o valor absoluto para dimensionar o tipo INT corretamente
-        valor_abs = abs(valor_tratado)
-        if MAX_FIELD_SIZES[chave]['type'] in ('unknown', 'int'):
-            MAX_FIELD_SIZES[chave]['type'] = 'int'
-            MAX_FIELD_SIZES[chave]['max_val'] = max(MAX_FIELD_SIZES[chave]['max_val'], valor_abs)
+        # (comparações diretas, sem as chamadas de abs() e max())
+        valor_abs = -valor_tratado if valor_tratado < 0 else valor_tratado
+        tipo_atual = tipos.get(chave, 'unknown')
+        if tipo_atual == 'unknown':
+            tipos[chave] = 'int'
+        elif tipo_atual != 'int' and not parcial:
+            return
+        if valor_abs > max_vals.get(chave, -math.inf):
+            max_vals[chave] = valor_abs
     
-def tratar_dados_apenas_para_validacao(dados: Dict[str, Any]):
+def tratar_dados_apenas_para_validacao(dados: Dict[str, Any], tamanhos: MapaTamanhos = None, parcial: bool = False):
     """ 
     Rotina de Dimensionamento: Percorre o registro e atualiza o tamanho máximo encontrado
-    para cada campo. NÃO realiza adaptação semântica de tipos (data -> date, etc.).
+    para cada campo (no mapa 'tamanhos' ou, sem ele, no global; 'parcial' não trava o tipo).
+    NÃO realiza adaptação semântica de tipos (data -> date, etc.).
     """
-    for chave, valor in dados.items():
-        # Ignora listas ou objetos aninhados (o relatório de DDL não os dimensiona diretamente)
-        if isinstance(valor, (list, dict)):
-            continue 
+    if tamanhos is None:
+        tamanhos = MAX_FIELD_SIZES
+    tipos, max_lens = tamanhos[0], tamanhos[1]
 
-        # 1. Limpeza e Preservação de Tipo
-        # O valor limpo é usado para o cálculo de tamanho, mas o tipo é preservado.
-        valor_limpo = limpar_texto(valor)
+    # Nomes locais (leitura mais rápida que a de globais no laço executado para todo campo)
+    limpar = limpar_texto
+    inteiro = validar_inteiro
+    chave_numerica = _chave_numerica
+    atualizar = atualizar_max_size
+    tipo_do_campo = tipos.get
+    tamanho_do_campo = max_lens.get
+
+    for chave, valor in dados.items():
+        # Despacho pelo tipo exato, feito uma única vez por campo
+        # (o JSON só produz str, int, float, bool, None, list e dict)
+        tipo_valor = type(valor)
+        if tipo_valor is str:
+            # 1. Limpeza (só strings precisam; para os demais tipos seria uma no-op)
+            # O valor limpo é usado para o cálculo de tamanho, mas o tipo é preservado.
+            valor = limpar(valor)
+        elif tipo_valor is not int and tipo_valor is not float and tipo_valor is not bool:
+            # Ignora None, listas e objetos aninhados (o relatório de DDL não os dimensiona diretamente)
+            continue
 
         # 2. Heurística para campos que PODEM ser numéricos (para dimensionar INT)
-        if "numero" in chave.lower() or "id" in chave.lower():
-            valor_numerico = validar_inteiro(valor_limpo)
+        if chave_numerica(chave):
+            valor_numerico = inteiro(valor)
             if valor_numerico is not None:
-                atualizar_max_size(chave, valor_numerico)
+                atualizar(chave, valor_numerico, tamanhos, parcial)
                 continue # Se foi tratado como INT, pula o tratamento STRING
 
         # 3. Tratamento Padrão (Tudo o que restou é tratado como STRING)
         # Campos que parecem data, float ou booleanos são tratados como string para preservar o formato.
-        if isinstance(valor_limpo, str):
-            atualizar_max_size(chave, valor_limpo)
-        elif isinstance(valor_limpo, (int, float, bool)):
-            # Converte tipos primitivos não rastreados acima para string para fins de tamanho (ex: booleanos)
-            atualizar_max_size(chave, str(valor_limpo))
-        # Note: Valores None são ignorados e não afetam o dimensionamento.
+        # Tipos primitivos não rastreados acima são convertidos para string para fins de tamanho (ex: booleanos)
+        texto = valor if tipo_valor is str else str(valor)
+
+        # Atualização de STRING em linha (mesma regra de 'atualizar_max_size', sem a chamada de função)
+        chave_mapa = 'id_origem' if chave == 'id' else chave
+        tipo_atual = tipo_do_campo(chave_mapa, 'unknown')
+        if tipo_atual == 'unknown':
+            tipos[chave_mapa] = 'string'
+        elif tipo_atual != 'string' and not parcial:
+            continue
+        tamanho = len(texto)
+        if tamanho > tamanho_do_campo(chave_mapa, 0):
+            max_lens[chave_mapa] = tamanho
+
+def mesclar_tamanhos(parcial: MapaTamanhos, destino: MapaTamanhos):
+    """ 
+    Rotina de Redução: Incorpora o mapa parcial de um arquivo (tipo não travado) ao mapa global,
+    reproduzindo as regras de 'atualizar_max_size': o resultado é o mesmo da varredura serial.
+    """
+    tipos, max_lens, max_vals = destino
+    p_max_lens, p_max_vals = parcial[1:]
+
+    for chave, primeiro_tipo in parcial[0].items():
+        # Um campo ainda sem tipo assume o primeiro tipo visto no arquivo (como na varredura serial)
+        tipo_atual = tipos.get(chave, 'unknown')
+        if tipo_atual == 'unknown':
+            tipo_atual = tipos[chave] = primeiro_tipo
+
+        # Só os valores do tipo travado contam; os do outro tipo seriam ignorados na varredura serial
+        if tipo_atual == 'string':
+            if p_max_lens.get(chave, 0) > max_lens.get(chave, 0):
+                max_lens[chave] = p_max_lens[chave]
+        elif tipo_atual == 'int':
+            if p_max_vals.get(chave, -math.inf) > max_vals.get(chave, -math.inf):
+                max_vals[chave] = p_max_vals[chave]
 
 # --- Funções de Relatório e Estatísticas ---
 
@@ -129,8 +254,8 @@ def gerar_relatorio_final(estatisticas: Dict[str, int]):
     
     # Filtra apenas chaves válidas (que apareceram ou que são TEXT longo predefinido)
     valid_keys = {
-        k: v for k, v in MAX_FIELD_SIZES.items() 
-        if v['type'] != 'unknown' or k in FIELDS_TO_KEEP_LONG
+        k: tipo for k, tipo in FIELD_TYPES.items() 
+        if tipo != 'unknown' or k in FIELDS_TO_KEEP_LONG
     }
     
     if not valid_keys:
@@ -155,15 +280,14 @@ def gerar_relatorio_final(estatisticas: Dict[str, int]):
             f.write("{:<30} | {:<10} | {:<20}\n".format("ATRIBUTO (DB)", "TIPO DETECTADO", "TAMANHO MÁXIMO/VALOR"))
             f.write("----------------------------------------------------------\n")
             
-            for chave, dados in sorted(valid_keys.items()):
-                tipo = dados.get('type', 'unknown')
+            for chave, tipo in sorted(valid_keys.items()):
                 is_long_field = chave in FIELDS_TO_KEEP_LONG
                 
                 # --- Lógica de Sugestão DDL ---
-                if is_long_field or (tipo == 'string' and dados['max_len'] > 255):
+                if is_long_field or (tipo == 'string' and FIELD_MAX_LEN.get(chave, 0) > 255):
                     # Tipo TEXT
                     sugestao = "TEXT"
-                    max_len = dados['max_len'] if tipo == 'string' else 'N/A'
+                    max_len = FIELD_MAX_LEN.get(chave, 0) if tipo == 'string' else 'N/A'
                     if is_long_field:
                         sugestao += " (Texto Longo Predefinido)"
                     f.write("{:<30} | {:<10} | {:<20} (Sugestão: {})\n".format(
@@ -171,7 +295,7 @@ def gerar_relatorio_final(estatisticas: Dict[str, int]):
                 
                 elif tipo == 'string':
                     # Tipo VARCHAR (Tamanho ajustado com margem de segurança)
-                    max_len = dados['max_len']
+                    max_len = FIELD_MAX_LEN.get(chave, 0)
                     if max_len == 0:
                         max_len_display = f"0 (Default {DEFAULT_VARCHAR_SIZE})"
                         sugestao = f"VARCHAR({DEFAULT_VARCHAR_SIZE})"
@@ -196,7 +320,7 @@ def gerar_relatorio_final(estatisticas: Dict[str, int]):
                         
                 elif tipo == 'int':
                     # Tipo INT (Baseado no valor máximo encontrado)
-                    max_val = dados['max_val']
+                    max_val = FIELD_MAX_VAL.get(chave, -math.inf)
                     if max_val <= 32767:
                         sugestao = "SMALLINT"
                     elif max_val <= 2147483647:
@@ -219,6 +343,104 @@ def gerar_relatorio_final(estatisticas: Dict[str, int]):
     except Exception as e:
         print(f"\nErro ao gerar o relatório de dimensionamento: {e}", file=sys.stderr)
 
+# --- Varredura de Arquivo (executada nos processos de trabalho) ---
+
+def dimensionar_registros(registros: Iterable[Any], tamanhos: MapaTamanhos, parcial: bool = True) -> int:
+    """ Dimensiona cada registro (lista já carregada ou fluxo do ijson) e retorna quantos foram lidos. """
+    tipos = tamanhos[0]
+    total_registros = 0
+    for elemento in registros:
+        # A contagem de inventário é a primeira ação (não depende do sucesso do tratamento)
+        total_registros += 1
+        
+        # Rotina de segurança: Identifica novas chaves no registro
+        for chave in elemento.keys():
+            chave_no_mapa = 'id_origem' if chave == 'id' else chave
+            if chave_no_mapa not in tipos:
+                # Inicializa a chave com 'unknown'
+                tipos[chave_no_mapa] = 'unknown'
+
+        # Atualiza o dimensionamento do campo
+        tratar_dados_apenas_para_validacao(elemento, tamanhos, parcial)
+    return total_registros
+
+def escanear_arquivo(caminho_arquivo: str, tamanhos: MapaTamanhos = None) -> Tuple[MapaTamanhos, int, Union[str, None]]:
+    """
+    Lê um arquivo JSON e dimensiona seus registros em um mapa local (parcial).
+    Com 'tamanhos', dimensiona em série nesse mapa (tipo travado, como no mapa global).
+    Retorna o mapa, o total de registros e a mensagem de erro (ou None).
+    """
+    parcial = tamanhos is None
+    if parcial:
+        tamanhos = _novo_mapa()
+
+    try:
+        # Rotina de segurança: Abrindo e carregando JSON
+        with open(caminho_arquivo, "rb") as f:
+            if ijson is not None and f.peek(64).lstrip()[:1] == b"[":
+                # Lista de registros: processa um registro por vez, à medida que é lido
+                registros = ijson.items(f, "item", use_float=True)
+                return tamanhos, dimensionar_registros(registros, tamanhos, parcial), None
+
+            # Modo binário: o parser decodifica o UTF-8 de uma só vez
+            dados = _json_loads(f.read())
+
+        registros = []
+        if isinstance(dados, list):
+            registros = dados
+        elif isinstance(dados, dict):
+            registros = [dados]
+        # Formatos inválidos são ignorados (lista vazia), mas a varredura continua
+
+        total_registros = dimensionar_registros(registros, tamanhos, parcial)
+
+    except _JSON_ERRORS as e:
+        # Rotina de segurança: Erro no formato JSON
+        return _novo_mapa(), 0, f"\n[ERRO GRAVE] Falha no formato JSON do arquivo {caminho_arquivo}: {e}"
+    except Exception as e:
+        # Rotina de segurança: Erro de I/O, permissão, etc.
+        return _novo_mapa(), 0, f"\n[ERRO CRÍTICO] Falha ao processar arquivo {caminho_arquivo}: {e}"
+
+    return tamanhos, total_registros, None
+
+def verificar_equivalencia_serial(arquivos_json: List[str]) -> bool:
+    """ Refaz a varredura em série, na mesma ordem de arquivos, e compara com o mapa global (paralelo). """
+    mapa_serial = _novo_mapa(campos_longos=True)
+    for caminho_arquivo in arquivos_json:
+        escanear_arquivo(caminho_arquivo, mapa_serial)
+    if mapa_serial == MAX_FIELD_SIZES:
+        print("[VERIFICAÇÃO] Varredura paralela idêntica à varredura serial.")
+        return True
+    for chave in sorted(set(mapa_serial[0]) | set(FIELD_TYPES)):
+        serial = tuple(mapa.get(chave) for mapa in mapa_serial)
+        paralelo = tuple(mapa.get(chave) for mapa in MAX_FIELD_SIZES)
+        if serial != paralelo:
+            print(f"[VERIFICAÇÃO] Divergência em '{chave}': serial {serial} / paralelo {paralelo}", file=sys.stderr)
+    return False
+
+# --- Coleta de Arquivos ---
+
+def iterar_arquivos_json(pasta: str, estatisticas: Dict[str, int]) -> Iterator[str]:
+    """
+    Percorre a pasta (e subpastas) com os.scandir, sem recursão, produzindo os caminhos
+    dos arquivos JSON. Cada pasta lida é contada em estatisticas['pastas_lidas'].
+    """
+    pendentes = [pasta]
+    while pendentes:
+        diretorio = pendentes.pop()
+        try:
+            with os.scandir(diretorio) as entradas:
+                estatisticas['pastas_lidas'] += 1
+                for entrada in entradas:
+                    # DirEntry já traz o tipo (sem stat extra) e o caminho completo (sem join)
+                    if entrada.is_dir(follow_symlinks=False):
+                        pendentes.append(entrada.path)
+                    elif entrada.name.endswith(".json"):
+                        yield entrada.path
+        except OSError as e:
+            # Rotina de segurança: pasta sem permissão ou removida durante a varredura
+            print(f"\n[AVISO] Não foi possível ler a pasta {diretorio}: {e}", file=sys.stderr)
+
 # --- Função de Validação Principal ---
 
 def validar_dimensionamento(pasta: str):
@@ -233,60 +455,35 @@ def validar_dimensionamento(pasta: str):
         'iteracoes_processadas': 0, # Total de todos os registros (contagem de inventário)
     }
     
-    # Conjunto para rastrear chaves totais encontradas no disco
-    chaves_totais = set(MAX_FIELD_SIZES.keys()) 
-
     print("Iniciando varredura e validação de dimensionamento robusto...")
     
-    for raiz, _, arquivos in os.walk(pasta):
-        estatisticas['pastas_lidas'] += 1 
-        
-        for arquivo in arquivos:
-            if arquivo.endswith(".json"):
-                caminho_arquivo = os.path.join(raiz, arquivo)
-                estatisticas['arquivos_encontrados'] += 1
-                
-                # Exibe o progresso no console
+    # 1. Coleta a lista de arquivos (a leitura e o dimensionamento são feitos em paralelo)
+    arquivos_json = list(iterar_arquivos_json(pasta, estatisticas))
+
+    # 2. Map: cada processo escaneia seus arquivos em um mapa local.
+    # Reduce: os mapas parciais são mesclados na ordem dos arquivos.
+    with ProcessPoolExecutor() as executor:
+        resultados = executor.map(escanear_arquivo, arquivos_json, chunksize=SCAN_CHUNKSIZE)
+        for caminho_arquivo, (parcial, total_registros, erro) in zip(arquivos_json, resultados):
+            estatisticas['arquivos_encontrados'] += 1
+            
+            # Exibe o progresso no console (a cada PROGRESS_INTERVAL arquivos, para poupar syscalls)
+            if estatisticas['arquivos_encontrados'] % PROGRESS_INTERVAL == 0:
                 sys.stdout.write(f"\rEscaneando arquivo: {os.path.basename(caminho_arquivo):<50}")
+                # O flush é necessário: a linha termina em '\r' e não seria exibida até o próximo '\n'
                 sys.stdout.flush()
 
-                try:
-                    # Rotina de segurança: Abrindo e carregando JSON
-                    with open(caminho_arquivo, "r", encoding="utf-8") as f:
-                        dados = json.load(f)
-
-                    registros = []
-                    if isinstance(dados, list):
-                        registros = dados
-                    elif isinstance(dados, dict):
-                        registros = [dados]
-                    else:
-                        # Ignora formatos inválidos, mas continua
-                        continue
+            if erro:
+                print(erro, file=sys.stderr)
+                continue
 
-                    for elemento in registros:
-                        # A contagem de inventário é a primeira ação (não depende do sucesso do tratamento)
-                        estatisticas['iteracoes_processadas'] += 1 
-                        
-                        # Rotina de segurança: Identifica novas chaves no registro
-                        for chave in elemento.keys():
-                            chave_no_mapa = 'id_origem' if chave == 'id' else chave
-                            if chave_no_mapa not in chaves_totais:
-                                # Inicializa a chave com 'unknown'
-                                MAX_FIELD_SIZES[chave_no_mapa]['type'] = 'unknown' 
-                                chaves_totais.add(chave_no_mapa)
-
-                        # Atualiza o dimensionamento do campo
-                        tratar_dados_apenas_para_validacao(elemento)
-
-                except json.JSONDecodeError as e:
-                    # Rotina de segurança: Erro no formato JSON
-                    print(f"\n[ERRO GRAVE] Falha no formato JSON do arquivo {caminho_arquivo}: {e}", file=sys.stderr)
-                except Exception as e:
-                    # Rotina de segurança: Erro de I/O, permissão, etc.
-                    print(f"\n[ERRO CRÍTICO] Falha ao processar arquivo {caminho_arquivo}: {e}", file=sys.stderr)
+            estatisticas['iteracoes_processadas'] += total_registros
+            mesclar_tamanhos(parcial, MAX_FIELD_SIZES)
 
     print(f"\rVarredura concluída. Total de arquivos JSON escaneados: {estatisticas['arquivos_encontrados']}. {' ' * 20}")
+
+    if VERIFICAR_SERIAL:
+        verificar_equivalencia_serial(arquivos_json)
     
     if estatisticas['arquivos_encontrados'] > 0:
         gerar_relatorio_final(estatisticas)
@@ -1,11 +1,24 @@
 import argparse
 import os
+import shutil
+import sqlite3
 import requests
-from bs4 import BeautifulSoup
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import HTTPError as Urllib3HTTPError
+from urllib3.util.retry import Retry
 from urllib.parse import urljoin, urlparse
 import time
-from typing import Set
+from typing import Dict, Set
 import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# Parser HTML: selectolax (backend em C) quando instalado; BeautifulSoup como alternativa
+try:
+    from selectolax.lexbor import LexborHTMLParser as HTMLParser
+except ImportError:
+    HTMLParser = None
+    from bs4 import BeautifulSoup
 
 # ==============================================================================
 # 🌟 BASE_PATH: Definida como o diretório final para logs e downloads.
@@ -28,9 +41,100 @@ TARGET_URLS = [
     "https://dadosabertos.web.stj.jus.br/dataset/espelhos-de-acordaos-sexta-turma"
 ]
 
-# Nome do arquivo de controle. Ele será criado DENTRO de cada subpasta de download.
+# Banco SQLite de controle (tabela 'done', nome do arquivo como chave primária, com o ETag,
+# o Last-Modified e o tamanho informados pelo servidor no download).
+# Ele será criado DENTRO de cada subpasta de download.
+CONTROL_DB_FILENAME = "control.db"
+# Arquivo de controle antigo (uma linha por arquivo), importado para o banco na primeira execução.
 CONTROL_FILENAME = "download_control.txt"
 
+# Seletor CSS para os links de download (o segundo <a> dentro da estrutura)
+DOWNLOAD_LINK_SELECTOR = '#dataset-resources > ul > li > div > ul > li:nth-child(2) > a'
+
+# Número de páginas (URLs) processadas em paralelo. O trabalho é de I/O de rede, então threads bastam.
+MAX_WORKERS = 8
+
+# Downloads simultâneos (somando todas as páginas) e tamanho dos blocos gravados em disco
+MAX_CONCURRENT_DOWNLOADS = 8
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024
+DOWNLOAD_SLOTS = threading.BoundedSemaphore(MAX_CONCURRENT_DOWNLOADS)
+
+# Locks por subpasta de download: protegem a leitura e as escritas do banco de controle
+# caso duas threads atendam o mesmo diretório.
+_CONTROL_LOCKS: Dict[str, threading.Lock] = {}
+_CONTROL_LOCKS_GUARD = threading.Lock()
+
+def get_control_lock(download_dir: str) -> threading.Lock:
+    """Retorna (criando, se necessário) o lock do banco de controle de uma subpasta."""
+    with _CONTROL_LOCKS_GUARD:
+        return _CONTROL_LOCKS.setdefault(os.path.normpath(download_dir), threading.Lock())
+
+# Sessão HTTP compartilhada: keep-alive e pool de conexões (sem novo handshake TCP/TLS a cada requisição),
+# com novas tentativas e backoff exponencial para falhas transitórias do servidor.
+USER_AGENT = "r2judgedstj-scraper/1.0 (+https://dadosabertos.web.stj.jus.br)"
+POOL_CONNECTIONS = 16
+POOL_MAXSIZE = 32
+
+def build_session() -> requests.Session:
+    """Cria a sessão HTTP com pool de conexões, retentativas e User-Agent padrão."""
+    session = requests.Session()
+    retry = Retry(
+        total=3,
+        backoff_factor=1,
+        status_forcelist=(429, 500, 502, 503, 504),
+        allowed_methods=frozenset({"GET", "HEAD"}),
+    )
+    adapter = HTTPAdapter(pool_connections=POOL_CONNECTIONS, pool_maxsize=POOL_MAXSIZE, max_retries=retry)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.headers.update({"User-Agent": USER_AGENT})
+    return session
+
+SESSION = build_session()
+
+# Limite de cortesia por servidor (hostname): requisições por segundo e rajada máxima.
+# Substitui a pausa fixa antes de cada download: as threads seguem assim que há uma "ficha" disponível.
+REQUESTS_PER_SECOND = 1.0
+BURST_SIZE = 1
+
+
+class RateLimiter:
+    """Token bucket thread-safe: libera até 'rate' requisições por segundo, com rajadas de até 'capacity'."""
+
+    def __init__(self, rate: float, capacity: int = 1):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.last_refill = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """Bloqueia até haver uma ficha disponível e a consome."""
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.last_refill) * self.rate)
+                self.last_refill = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait_seconds = (1 - self.tokens) / self.rate
+            # Dorme fora do lock para não bloquear as demais threads
+            time.sleep(wait_seconds)
+
+
+_RATE_LIMITERS: Dict[str, RateLimiter] = {}
+_RATE_LIMITERS_GUARD = threading.Lock()
+
+def get_rate_limiter(url: str) -> RateLimiter:
+    """Retorna (criando, se necessário) o limitador de requisições do servidor da URL."""
+    hostname = urlparse(url).hostname or ''
+    with _RATE_LIMITERS_GUARD:
+        limiter = _RATE_LIMITERS.get(hostname)
+        if limiter is None:
+            limiter = _RATE_LIMITERS[hostname] = RateLimiter(REQUESTS_PER_SECOND, BURST_SIZE)
+        return limiter
+
 # Configuração do Logging
 def setup_logging(base_path: str):
     """Configura o logger para imprimir no console e salvar em um arquivo de log, usando base_path."""
@@ -62,19 +166,42 @@ def setup_logging(base_path: str):
     logging.info("----------------------------------------------------------------------------------")
 
 
-def load_downloaded_files(control_filepath: str) -> Set[str]:
-    """Carrega a lista de nomes de arquivos já baixados do arquivo de controle específico da subpasta."""
-    downloaded_files = set()
-    if os.path.exists(control_filepath):
-        logging.info(f" -> Carregando controle de '{control_filepath}'...")
+def open_control_db(download_dir: str) -> sqlite3.Connection:
+    """
+    Abre (criando, se necessário) o banco de controle da subpasta. Na primeira abertura, importa
+    os nomes do arquivo de controle antigo (download_control.txt), se existir.
+    """
+    control_db = sqlite3.connect(os.path.join(download_dir, CONTROL_DB_FILENAME), check_same_thread=False)
+    control_db.execute(
+        "CREATE TABLE IF NOT EXISTS done (name TEXT PRIMARY KEY, etag TEXT, last_modified TEXT, size INTEGER)"
+    )
+    # Bancos criados antes das colunas de validação (apenas 'name') recebem as colunas novas
+    existing_columns = {row[1] for row in control_db.execute("PRAGMA table_info(done)")}
+    for column, column_type in (("etag", "TEXT"), ("last_modified", "TEXT"), ("size", "INTEGER")):
+        if column not in existing_columns:
+            control_db.execute(f"ALTER TABLE done ADD COLUMN {column} {column_type}")
+
+    legacy_filepath = os.path.join(download_dir, CONTROL_FILENAME)
+    if os.path.exists(legacy_filepath) and control_db.execute("SELECT 1 FROM done LIMIT 1").fetchone() is None:
+        logging.info(f" -> Importando controle antigo de '{legacy_filepath}'...")
         try:
-            with open(control_filepath, 'r', encoding='utf-8') as f:
-                for line in f:
-                    downloaded_files.add(line.strip())
+            with open(legacy_filepath, 'r', encoding='utf-8') as f:
+                control_db.executemany(
+                    "INSERT OR IGNORE INTO done (name) VALUES (?)",
+                    ((line.strip(),) for line in f if line.strip())
+                )
         except Exception as e:
-            logging.error(f"Erro ao ler o arquivo de controle '{control_filepath}'. Erro: {e}")
-            
-    return downloaded_files
+            logging.error(f"Erro ao ler o arquivo de controle '{legacy_filepath}'. Erro: {e}")
+    control_db.commit()
+    return control_db
+
+def load_downloaded_files(control_db: sqlite3.Connection) -> Set[str]:
+    """Carrega os nomes de arquivos já baixados do banco de controle específico da subpasta."""
+    return {name for (name,) in control_db.execute("SELECT name FROM done")}
+
+def load_known_etags(control_db: sqlite3.Connection) -> Set[str]:
+    """Carrega os ETags dos arquivos já baixados (conteúdo já presente na subpasta, mesmo com outro nome)."""
+    return {etag for (etag,) in control_db.execute("SELECT etag FROM done WHERE etag IS NOT NULL")}
 
 def get_filename_from_url(url, response_headers=None):
     """Tenta obter o nome do arquivo a partir do cabeçalho ou da URL, e o sanitiza."""
@@ -94,9 +221,18 @@ def get_filename_from_url(url, response_headers=None):
     return "".join(c for c in filename if c.isalnum() or c in ('.', '_', '-')).strip()
 
 
-def download_file(url: str, download_dir: str, filename: str, control_filepath: str, downloaded_files_set: Set[str], pause_seconds: int = 3):
+def extract_download_hrefs(content: bytes) -> list:
+    """Extrai o atributo href (ou None, se ausente) de cada link de download da página."""
+    if HTMLParser is not None:
+        return [link.attributes.get('href') for link in HTMLParser(content).css(DOWNLOAD_LINK_SELECTOR)]
+    soup = BeautifulSoup(content, 'html.parser')
+    return [link.get('href') for link in soup.select(DOWNLOAD_LINK_SELECTOR)]
+
+
+def download_file(url: str, download_dir: str, filename: str, control_db: sqlite3.Connection, downloaded_files_set: Set[str], known_etags: Set[str]):
     """
-    Baixa um arquivo, verifica o arquivo de controle ESPECÍFICO da subpasta e atualiza o registro.
+    Baixa um arquivo, verifica o banco de controle ESPECÍFICO da subpasta e atualiza o registro.
+    Antes do download, um HEAD compara o ETag do servidor com os já baixados (arquivo renomeado não é baixado de novo).
     download_dir JÁ CONTÉM A BASE_PATH.
     """
     
@@ -105,47 +241,83 @@ def download_file(url: str, download_dir: str, filename: str, control_filepath:
         logging.info(f" -> PULANDO: Arquivo '{filename}' já está no controle desta pasta.")
         return False
     
-    # 2. Pausa antes do download
-    logging.info(f" -> Pausando por {pause_seconds}s e tentando baixar: {filename}...")
-    time.sleep(pause_seconds)
+    # 2. Pré-checagem (HEAD): conteúdo com ETag já baixado é apenas registrado com o nome novo.
+    # Cada requisição aguarda a vez no limitador de requisições do servidor.
+    limiter = get_rate_limiter(url)
+    limiter.acquire()
+    etag = None
+    try:
+        head = SESSION.head(url, allow_redirects=True, timeout=15)
+        if head.ok:
+            etag = head.headers.get('ETag')
+    except requests.exceptions.RequestException as e:
+        logging.warning(f" -> Aviso: HEAD falhou para '{url}', seguindo com o download. Erro: {e}")
+
+    if etag and etag in known_etags:
+        with get_control_lock(download_dir):
+            control_db.execute("INSERT OR IGNORE INTO done (name, etag) VALUES (?, ?)", (filename, etag))
+            downloaded_files_set.add(filename)
+        logging.info(f" -> PULANDO: Conteúdo de '{filename}' (ETag {etag}) já foi baixado nesta pasta.")
+        return False
+
+    limiter.acquire()
+    logging.info(f" -> Tentando baixar: {filename}...")
     
     # Cria o caminho completo do arquivo - download_dir JÁ CONTÉM A BASE_PATH
     filepath = os.path.join(download_dir, filename)
     
     try:
-        # 3. Requisição HTTP
-        response = requests.get(url, stream=True, timeout=30)
-        response.raise_for_status()
+        # 3. Requisição HTTP (limitada a MAX_CONCURRENT_DOWNLOADS transferências simultâneas;
+        # o 'with' devolve a conexão ao pool da sessão mesmo em caso de erro)
+        with DOWNLOAD_SLOTS, SESSION.get(url, stream=True, timeout=30) as response:
+            response.raise_for_status()
+
+            # 4. Escreve o arquivo em blocos de 1 MiB, com a cópia feita por shutil (sem laço Python por bloco)
+            # decode_content: descompacta gzip/deflate como o iter_content faria
+            # filepath JÁ CONTÉM A BASE_PATH
+            response.raw.decode_content = True
+            with open(filepath, 'wb') as file:
+                shutil.copyfileobj(response.raw, file, length=DOWNLOAD_CHUNK_SIZE)
+
+            etag = response.headers.get('ETag') or etag
+            last_modified = response.headers.get('Last-Modified')
 
-        # 4. Escreve o arquivo em blocos
-        # filepath JÁ CONTÉM A BASE_PATH
-        with open(filepath, 'wb') as file:
-            for chunk in response.iter_content(chunk_size=8192):
-                if chunk:
-                    file.write(chunk)
-
-        # 5. Atualiza o arquivo de controle e o set em memória
-        # control_filepath JÁ CONTÉM A BASE_PATH
-        with open(control_filepath, 'a', encoding='utf-8') as f:
-            f.write(filename + '\n')
-            
-        downloaded_files_set.add(filename)
+        # 5. Atualiza o banco de controle (com os validadores do servidor) e os sets em memória
+        # (sem commit por arquivo: process_page grava tudo em uma única transação ao final da página)
+        with get_control_lock(download_dir):
+            control_db.execute(
+                "INSERT OR IGNORE INTO done (name, etag, last_modified, size) VALUES (?, ?, ?, ?)",
+                (filename, etag, last_modified, os.path.getsize(filepath))
+            )
+            downloaded_files_set.add(filename)
+            if etag:
+                known_etags.add(etag)
         
         logging.info(f" -> SUCESSO: Arquivo salvo em '{filepath}' e controle ATUALIZADO.")
         return True
         
-    except requests.exceptions.RequestException as e:
+    except (requests.exceptions.RequestException, Urllib3HTTPError) as e:
+        # response.raw não passa pelo encapsulamento do requests: falhas no meio da transferência
+        # (ProtocolError, ReadTimeoutError, DecodeError) chegam como exceções do urllib3
         logging.error(f" -> ERRO (Requisição): Não foi possível baixar '{url}'. Erro: {e}")
-        # Tenta remover o arquivo parcial se ele existir
-        if os.path.exists(filepath):
-               os.remove(filepath)
-               logging.warning(f" -> Aviso: Arquivo parcial '{filepath}' foi removido.")
+        remove_partial_file(filepath)
         return False
     except Exception as e:
         logging.error(f" -> ERRO (Geral): Erro inesperado ao processar o download. Erro: {e}")
+        remove_partial_file(filepath)
         return False
 
 
+def remove_partial_file(filepath: str):
+    """ Remove o arquivo parcial de um download que falhou (se ele existir). """
+    try:
+        if os.path.exists(filepath):
+            os.remove(filepath)
+            logging.warning(f" -> Aviso: Arquivo parcial '{filepath}' foi removido.")
+    except OSError as e:
+        logging.error(f" -> ERRO: Não foi possível remover o arquivo parcial '{filepath}'. Erro: {e}")
+
+
 def process_page(url: str, base_download_dir: str):
     """
     Processa uma única página, define a subpasta, carrega o controle específico e inicia os downloads.
@@ -156,11 +328,9 @@ def process_page(url: str, base_download_dir: str):
     subfolder_name = url.split('/')[-1]
     # download_dir AGORA É BASE_PATH/subfolder_name
     download_dir = os.path.join(base_download_dir, subfolder_name) 
-    control_filepath = os.path.join(download_dir, CONTROL_FILENAME)
     
-    # Cria a subpasta se ela não existir
-    if not os.path.exists(download_dir):
-        os.makedirs(download_dir)
+    # Cria a subpasta se ela não existir (exist_ok: outra thread pode criá-la ao mesmo tempo)
+    os.makedirs(download_dir, exist_ok=True)
     
     logging.info(f"\n========================================================")
     logging.info(f"Processando URL: {url}")
@@ -168,52 +338,64 @@ def process_page(url: str, base_download_dir: str):
     logging.info(f"========================================================")
     
     # 2. Carrega o controle de download ESPECÍFICO desta subpasta
-    downloaded_files_set = load_downloaded_files(control_filepath)
+    with get_control_lock(download_dir):
+        control_db = open_control_db(download_dir)
+        downloaded_files_set = load_downloaded_files(control_db)
+        known_etags = load_known_etags(control_db)
     logging.info(f" -> {len(downloaded_files_set)} arquivos já registrados nesta pasta.")
     
     try:
-        response = requests.get(url, timeout=15)
+        response = SESSION.get(url, timeout=15)
         response.raise_for_status()
-        soup = BeautifulSoup(response.content, 'html.parser')
-        
-        # Seletor CSS para os links de download (o segundo <a> dentro da estrutura)
-        download_links = soup.select('#dataset-resources > ul > li > div > ul > li:nth-child(2) > a')
+        download_hrefs = extract_download_hrefs(response.content)
 
-        if not download_links:
+        if not download_hrefs:
             logging.warning(" -> Nenhum link de download encontrado no seletor esperado. Pulando página.")
             return
 
-        logging.info(f" -> Encontrados {len(download_links)} links de recurso nesta página.")
+        logging.info(f" -> Encontrados {len(download_hrefs)} links de recurso nesta página.")
 
-        for i, link in enumerate(download_links):
-            href = link.get('href')
-            
+        # 3. Monta a lista de downloads (um por nome de arquivo, para que duas threads não gravem o mesmo arquivo)
+        downloads = {}
+        for i, href in enumerate(download_hrefs):
             if href:
                 full_url = urljoin(url, href)
                 preliminary_filename = get_filename_from_url(full_url)
-                
-                # 3. Chama a função de download
-                download_file(
-                    url=full_url, 
-                    download_dir=download_dir, # BASE_PATH/subpasta
-                    filename=preliminary_filename,
-                    control_filepath=control_filepath, # BASE_PATH/subpasta/controle.txt
-                    downloaded_files_set=downloaded_files_set 
-                )
+                downloads.setdefault(preliminary_filename, full_url)
             else:
                 logging.warning(f" -> Aviso: Link {i + 1} sem atributo href. Pulando.")
+
+        # 4. Baixa os arquivos da página em paralelo
+        with ThreadPoolExecutor(max_workers=MAX_CONCURRENT_DOWNLOADS) as executor:
+            list(executor.map(
+                lambda item: download_file(
+                    url=item[1], 
+                    download_dir=download_dir, # BASE_PATH/subpasta
+                    filename=item[0],
+                    control_db=control_db, # BASE_PATH/subpasta/control.db
+                    downloaded_files_set=downloaded_files_set,
+                    known_etags=known_etags
+                ),
+                downloads.items()
+            ))
         
     except requests.exceptions.RequestException as e:
         logging.error(f" -> ERRO na Requisição para {url}: {e}")
     except Exception as e:
         logging.error(f" -> ERRO Inesperado ao processar a página: {e}")
+    finally:
+        # Um único commit (e sincronização em disco) por página, com todos os arquivos baixados nela
+        with get_control_lock(download_dir):
+            control_db.commit()
+            control_db.close()
 
 
 def run_all_scrapers(urls: list, base_download_dir: str):
-    """Orquestra o processo de download em todas as URLs."""
+    """Orquestra o processo de download em todas as URLs, processando as páginas em paralelo."""
     
-    for url in urls:
-        process_page(url, base_download_dir)
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+        # list() aguarda todas as páginas; process_page já trata e loga os próprios erros
+        list(executor.map(lambda url: process_page(url, base_download_dir), urls))
 
     logging.info("\n--------------------------------------------------------")
     logging.info("RODADA DE DOWNLOADS CONCLUÍDA.")
@@ -1,16 +1,41 @@
 import os
-from fastapi import FastAPI
+import math
+import time
+import json
+import asyncio
+import threading
+import httpx
+from functools import lru_cache
+from fastapi import FastAPI, HTTPException
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import ORJSONResponse, StreamingResponse
 from pydantic import BaseModel
-from typing import Optional
+from typing import List, Optional
+from psycopg import OperationalError
+from psycopg_pool import AsyncConnectionPool
+from sqlalchemy.exc import OperationalError as SQLAlchemyOperationalError
+from tenacity import retry, stop_after_attempt, wait_exponential
 
 # --- Correções e Importações LangChain ---
 # Importações necessárias para construir a nova cadeia RAG com LCEL
 from langchain_core.prompts import ChatPromptTemplate
-from langchain_core.runnables import RunnablePassthrough
 from langchain_core.output_parsers import StrOutputParser
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
 from langchain_community.llms import Ollama
-from langchain_community.vectorstores.pgvector import PGVector
+from langchain_community.vectorstores.pgvector import PGVector, DistanceStrategy
 from langchain_community.embeddings import OllamaEmbeddings
+from langchain.embeddings import CacheBackedEmbeddings
+from langchain.storage import LocalFileStore
+from langchain.retrievers.multi_query import MultiQueryRetriever
+
+# Contagem de tokens do contexto: tiktoken (cl100k_base, próximo do tokenizador do Llama 3) se instalado;
+# senão, estimativa de ~4 caracteres por token
+try:
+    import tiktoken
+    _TOKENIZER = tiktoken.get_encoding("cl100k_base")
+except Exception:
+    _TOKENIZER = None
 
 
 # --- Configuração: Mapeando Variáveis do Docker-Compose ---
@@ -22,12 +47,12 @@ from langchain_community.embeddings import OllamaEmbeddings
 # URL do Ollama. No docker é 'http://ollama:11434'. Localmente é 'http://localhost:11434'.
 LLM_API_URL = os.getenv("LLM_API_URL", "http://localhost:11434")
 
-# URL do PGVector (judged_llm_db). No docker é 'judged_llm_db:5432'.
-# Localmente, a porta exposta é 5433.
+# URL do PGVector (judged_llm_db), acessado pelo PgBouncer (pool em modo transação).
+# No docker é 'pgbouncer:5432'. Localmente, a porta exposta é 6432 (5433 = banco direto, sem o PgBouncer).
 DB_USER = "admin"
 DB_PASS = "admin"
-DB_HOST = "localhost" # 'judged_llm_db' no docker
-DB_PORT = "5433"      # '5432' no docker
+DB_HOST = "localhost" # 'pgbouncer' no docker
+DB_PORT = "6432"      # '5432' no docker
 DB_NAME = "vector_storage"
 
 # Constrói o URL de conexão para o PGVector local:
@@ -35,26 +60,96 @@ DEFAULT_DB_URL = f"postgresql+psycopg2://{DB_USER}:{DB_PASS}@{DB_HOST}:{DB_PORT}
 DATABASE_URL = os.getenv("DATABASE_URL", DEFAULT_DB_URL)
 
 # Modelos
-OLLAMA_MODEL = "llama3" # Modelo LLM principal
+# Modelo LLM principal: Llama 3 8B quantizado em 4 bits (Q4_K_M), mais tokens/s com perda desprezível no RAG
+OLLAMA_MODEL = os.getenv("OLLAMA_MODEL", "llama3:8b-instruct-q4_K_M")
 EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "nomic-embed-text") 
+EMBEDDING_DIMENSION = 768 # Dimensão dos vetores do nomic-embed-text
 COLLECTION_NAME = "judged_documents" # Nome da coleção PGVector
 
+# Pool de conexões do SQLAlchemy usado pelo PGVector (conexões reaproveitadas entre as requisições)
+DB_ENGINE_ARGS = {
+    "pool_size": 20,
+    "max_overflow": 10,
+    "pool_pre_ping": True,   # Descarta conexões derrubadas pelo PgBouncer/servidor antes de usá-las
+    "pool_recycle": 1800,
+}
+
+# Cache de embeddings: em disco (persiste entre reinícios) e, para as perguntas, também em memória (LRU)
+EMBEDDING_CACHE_DIR = os.getenv("EMBEDDING_CACHE_DIR", "./emb_cache")
+EMBEDDING_QUERY_CACHE_SIZE = 4096
+# Textos por chamada ao modelo de embedding (e por gravação no cache) ao vetorizar documentos
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "64"))
+
+# Multi-query: o LLM gera variações da pergunta e as buscas no pgvector rodam em paralelo (asyncio.gather).
+# Melhora o recall, mas acrescenta uma chamada ao LLM por pergunta; por isso é opcional.
+MULTI_QUERY_RETRIEVER = os.getenv("MULTI_QUERY_RETRIEVER", "false").lower() == "true"
+
+# Reranking: busca RERANK_FETCH_K trechos no pgvector e um cross-encoder local (CPU) escolhe os RETRIEVER_K
+# mais relevantes para o LLM. Compensa o recall da busca aproximada por uma fração do custo de uma geração.
+# Opcional: requer sentence-transformers (e torch) instalados.
+RETRIEVER_K = 3
+RERANKER = os.getenv("RERANKER", "false").lower() == "true"
+RERANKER_MODEL = os.getenv("RERANKER_MODEL", "BAAI/bge-reranker-base")
+RERANK_FETCH_K = 10
+RERANKER_THREADS = 4 # Threads do torch na CPU (o restante fica para o event loop e o Ollama)
+
+# Busca híbrida: a busca vetorial (<#>) e a textual (tsvector/GIN, criados pelo db_init_vetorial.py)
+# trazem HYBRID_FETCH_K trechos cada e são combinadas por Reciprocal Rank Fusion (score = Σ 1/(RRF_K + posição)).
+# Recupera termos exatos (números de artigos, nomes de ministros) que a busca densa sozinha perde.
+HYBRID_SEARCH = os.getenv("HYBRID_SEARCH", "true").lower() == "true"
+HYBRID_FETCH_K = 20
+RRF_K = 60
+TEXT_SEARCH_CONFIG = "portuguese"
+
+# Inicialização preguiçosa dos componentes RAG: tentativas com backoff exponencial por requisição.
+# Uma falha (Ollama/PostgreSQL fora do ar) não é memorizada: a próxima requisição tenta de novo.
+INIT_RETRY_ATTEMPTS = 3
+INIT_RETRY_MAX_WAIT = 8 # segundos
+
+# Aquecimento do Ollama: em um cache miss, um /api/generate com prompt vazio carrega o modelo na memória
+# enquanto a busca no pgvector roda em paralelo (asyncio.gather). Só é enviado se o modelo pode ter sido
+# descarregado, isto é, se ficou ocioso por mais de OLLAMA_WARMUP_INTERVAL (menor que o keep_alive).
+# O keep_alive de 1h mantém o modelo carregado entre as requisições (sem o custo de recarga após ociosidade curta).
+OLLAMA_KEEP_ALIVE = "1h"
+OLLAMA_WARMUP_INTERVAL = 3300 # segundos (55 min)
+
+# Janela de contexto e limite de geração do Llama 3: o prompt curto + 3 trechos (CONTEXT_MAX_TOKENS) cabe
+# folgado em 2048 tokens, e o cache KV alocado por requisição cai a 1/4 do padrão de 8192.
+OLLAMA_NUM_CTX = 2048
+OLLAMA_NUM_PREDICT = 512
+OLLAMA_HTTP_LIMITS = httpx.Limits(max_connections=50, max_keepalive_connections=20)
+
+# Orçamento de tokens do contexto enviado ao LLM: o prefill do Llama 3 é linear no tamanho do prompt.
+# Os trechos recuperados entram em ordem de relevância; os que estourarem o orçamento são descartados.
+CONTEXT_MAX_TOKENS = int(os.getenv("CONTEXT_MAX_TOKENS", "1200"))
+CHARS_PER_TOKEN = 4 # Estimativa usada sem o tiktoken
+
+# Cache semântico: respostas anteriores reaproveitadas para perguntas quase idênticas (sem chamar o LLM)
+SEMANTIC_CACHE_TABLE = "semantic_cache"
+SEMANTIC_CACHE_MAX_DISTANCE = 0.05      # Distância de cosseno máxima (1 - produto interno) para um acerto
+
+# Pool assíncrono (psycopg 3) da busca textual e do cache semântico
+DB_POOL_MIN_SIZE = 1
+DB_POOL_MAX_SIZE = 8
+
 
 # --- Configuração FastAPI ---
 
 app = FastAPI(
     title="Agente Especialista RAG (Português)", 
-    description="Agente que consulta o LLM e o banco vetorizado legal. Respostas em Português do Brasil."
+    description="Agente que consulta o LLM e o banco vetorizado legal. Respostas em Português do Brasil.",
+    # orjson serializa as respostas (com ementas/decisões longas) bem mais rápido que o json da biblioteca padrão
+    default_response_class=ORJSONResponse
 )
 
 
 # --- Template do Prompt em Português ---
 # Este template é crucial para instruir o LLM a usar os documentos E responder em Português.
-SYSTEM_PROMPT = """Você é um assistente RAG especializado em direito legal. 
-Sua tarefa é responder a perguntas estritamente com base no contexto fornecido. 
-Se a pergunta não puder ser respondida usando o contexto, diga que você não tem informações suficientes, 
-mas mantenha a resposta no idioma Português do Brasil.
-Contexto: {context}"""
+# Curto de propósito: cada token do prompt é processado (prefill) em toda requisição.
+SYSTEM_PROMPT = """Você é um assistente jurídico. Responda em Português do Brasil, apenas com base no contexto.
+Se o contexto não bastar, diga que não tem informações suficientes.
+Contexto:
+{context}"""
 
 prompt = ChatPromptTemplate.from_messages(
     [
@@ -64,10 +159,115 @@ prompt = ChatPromptTemplate.from_messages(
 )
 
 
+# --- Contexto com Orçamento de Tokens ---
+
+def count_tokens(text: str) -> int:
+    """Conta (ou estima, sem o tiktoken) os tokens de um texto."""
+    if _TOKENIZER is not None:
+        return len(_TOKENIZER.encode(text))
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+def format_docs(docs) -> str:
+    """Junta os trechos recuperados, em ordem de relevância, até o limite de CONTEXT_MAX_TOKENS."""
+    partes = []
+    total_tokens = 0
+    for doc in docs:
+        tokens = count_tokens(doc.page_content)
+        if partes and total_tokens + tokens > CONTEXT_MAX_TOKENS:
+            break
+        if not partes and tokens > CONTEXT_MAX_TOKENS:
+            # Trecho mais relevante maior que o orçamento inteiro: entra truncado
+            partes.append(doc.page_content[:CONTEXT_MAX_TOKENS * CHARS_PER_TOKEN])
+            break
+        partes.append(doc.page_content)
+        total_tokens += tokens
+    return "\n\n".join(partes)
+
+
+# --- Busca Híbrida (vetorial + textual) ---
+
+# Pool assíncrono (psycopg 3) do banco vetorial, usado pela busca textual e pelo cache semântico:
+# as consultas cedem o event loop, sem ocupar o threadpool. Aberto na primeira utilização.
+_db_pool: Optional[AsyncConnectionPool] = None
+_db_pool_lock = asyncio.Lock()
+
+async def get_db_pool() -> AsyncConnectionPool:
+    """Retorna o pool assíncrono de conexões do banco vetorial, abrindo-o na primeira chamada."""
+    global _db_pool
+    if _db_pool is None:
+        async with _db_pool_lock:
+            if _db_pool is None:
+                pool = AsyncConnectionPool(
+                    # O DATABASE_URL é do SQLAlchemy ('postgresql+psycopg2://'); o psycopg aceita apenas 'postgresql://'
+                    DATABASE_URL.replace("+psycopg2", "", 1),
+                    min_size=DB_POOL_MIN_SIZE,
+                    max_size=DB_POOL_MAX_SIZE,
+                    # Sem prepared statements no servidor: no modo transação do PgBouncer, a conexão muda a cada transação
+                    kwargs={"prepare_threshold": None},
+                    open=False
+                )
+                await pool.open()
+                _db_pool = pool
+    return _db_pool
+
+async def text_search(query: str, k: int) -> List[Document]:
+    """Busca textual (full-text em português) na coleção do agente, ordenada por ts_rank."""
+    pool = await get_db_pool()
+    async with pool.connection() as conn:
+        cursor = await conn.execute(
+            "SELECT e.document, e.cmetadata FROM langchain_pg_embedding e "
+            "JOIN langchain_pg_collection c ON c.uuid = e.collection_id, "
+            "plainto_tsquery(%s, %s) q "
+            "WHERE c.name = %s AND e.doc_tsv @@ q "
+            "ORDER BY ts_rank(e.doc_tsv, q) DESC LIMIT %s;",
+            (TEXT_SEARCH_CONFIG, query, COLLECTION_NAME, k)
+        )
+        rows = await cursor.fetchall()
+    return [Document(page_content=document, metadata=cmetadata or {}) for document, cmetadata in rows]
+
+def reciprocal_rank_fusion(result_lists: List[List[Document]], k: int) -> List[Document]:
+    """Combina listas ranqueadas por RRF (mesmo texto = mesmo trecho) e devolve os k melhores."""
+    scores = {}
+    docs = {}
+    for results in result_lists:
+        for rank, doc in enumerate(results, start=1):
+            scores[doc.page_content] = scores.get(doc.page_content, 0.0) + 1.0 / (RRF_K + rank)
+            docs.setdefault(doc.page_content, doc)
+    ranked = sorted(scores, key=scores.get, reverse=True)
+    return [docs[content] for content in ranked[:k]]
+
+class HybridRetriever(BaseRetriever):
+    """Retriever que funde (RRF) a busca vetorial do PGVector e a busca textual do PostgreSQL."""
+    vector_retriever: BaseRetriever
+    k: int = 3
+    fetch_k: int = HYBRID_FETCH_K
+
+    async def _text_search(self, query: str) -> List[Document]:
+        # A busca textual é um reforço: sem a coluna doc_tsv (db_init_vetorial.py não executado), segue só a vetorial
+        try:
+            return await text_search(query, self.fetch_k)
+        except Exception as e:
+            print(f"⚠️ Falha na busca textual (seguindo apenas com a vetorial): {e}")
+            return []
+
+    def _get_relevant_documents(self, query: str, *, run_manager) -> List[Document]:
+        # A busca textual usa o pool assíncrono: o caminho síncrono (não usado pelos endpoints) fica só com a vetorial
+        return self.vector_retriever.invoke(query)[:self.k]
+
+    async def _aget_relevant_documents(self, query: str, *, run_manager) -> List[Document]:
+        # As duas buscas são independentes: rodam em paralelo
+        dense, lexical = await asyncio.gather(
+            self.vector_retriever.ainvoke(query),
+            self._text_search(query)
+        )
+        return reciprocal_rank_fusion([dense, lexical], self.k)
+
+
 # --- Inicialização dos Componentes RAG ---
 
 def setup_rag_components():
     """Inicializa o LLM e o VectorStore/Retriever usando as configurações definidas e constrói a cadeia LCEL."""
+    global _llm_last_used
     print(f"⏳ Conectando ao LLM em: {LLM_API_URL}")
     print(f"⏳ Conectando ao DB em: {DATABASE_URL}")
     
@@ -75,71 +275,329 @@ def setup_rag_components():
     llm = Ollama(
         model=OLLAMA_MODEL, 
         base_url=LLM_API_URL, 
-        temperature=0
+        temperature=0,
+        keep_alive=OLLAMA_KEEP_ALIVE,
+        num_ctx=OLLAMA_NUM_CTX,
+        num_predict=OLLAMA_NUM_PREDICT
     )
     
-    # 2. Embedding
-    embeddings = OllamaEmbeddings(
-        model=EMBEDDING_MODEL,
-        base_url=LLM_API_URL
+    # 2. Embedding (com cache: pergunta repetida não faz nova chamada HTTP ao Ollama)
+    embeddings = CacheBackedEmbeddings.from_bytes_store(
+        OllamaEmbeddings(
+            model=EMBEDDING_MODEL,
+            base_url=LLM_API_URL
+        ),
+        LocalFileStore(EMBEDDING_CACHE_DIR),
+        namespace=EMBEDDING_MODEL,          # Separa os vetores de modelos diferentes
+        batch_size=EMBEDDING_BATCH_SIZE,
+        query_embedding_cache=True          # Cacheia também embed_query (usado pelo retriever)
     )
+    # Camada em memória na frente do cache em disco, compartilhada pelo cache semântico e pelo retriever
+    embeddings.embed_query = lru_cache(maxsize=EMBEDDING_QUERY_CACHE_SIZE)(embeddings.embed_query)
     
     # 3. VectorStore (Conexão ao pgvector)
     vector_store = PGVector(
         connection_string=DATABASE_URL,
         embedding_function=embeddings,
         collection_name=COLLECTION_NAME, 
-        pre_delete_collection=False 
+        pre_delete_collection=False,
+        engine_args=DB_ENGINE_ARGS,
+        # Produto interno (<#>): vetores do nomic-embed-text são normalizados, e o índice HNSW
+        # (halfvec_ip_ops, criado pelo db_init_vetorial.py) evita o Seq Scan da distância L2 padrão.
+        # O embedding da tabela é HALFVEC: o vetor da pergunta é enviado como literal e convertido pelo banco.
+        distance_strategy=DistanceStrategy.MAX_INNER_PRODUCT,
+        embedding_length=EMBEDDING_DIMENSION
     )
     
     # 4. Retrieval Chain (Combina LLM + Retriever + Prompt em PT-BR)
-    retriever = vector_store.as_retriever(search_kwargs={"k": 3})
+    # Com o reranker, busca mais candidatos (overfetch) para ele escolher os RETRIEVER_K finais
+    candidates_k = RERANK_FETCH_K if RERANKER else RETRIEVER_K
+    if HYBRID_SEARCH:
+        retriever = HybridRetriever(
+            vector_retriever=vector_store.as_retriever(search_kwargs={"k": HYBRID_FETCH_K}),
+            k=candidates_k
+        )
+    else:
+        retriever = vector_store.as_retriever(search_kwargs={"k": candidates_k})
+    if MULTI_QUERY_RETRIEVER:
+        # No caminho assíncrono (ainvoke), o MultiQueryRetriever dispara as buscas das variações
+        # com asyncio.gather: a latência fica próxima de uma busca, e não N buscas em sequência
+        retriever = MultiQueryRetriever.from_llm(retriever=retriever, llm=llm)
+    if RERANKER:
+        # Importações locais: dependências pesadas, carregadas só quando o reranking está ativo
+        import torch
+        from langchain.retrievers import ContextualCompressionRetriever
+        from langchain.retrievers.document_compressors import CrossEncoderReranker
+        from langchain_community.cross_encoders import HuggingFaceCrossEncoder
+
+        torch.set_num_threads(RERANKER_THREADS)
+        print(f"⏳ Carregando o reranker: {RERANKER_MODEL}")
+        retriever = ContextualCompressionRetriever(
+            base_retriever=retriever,
+            base_compressor=CrossEncoderReranker(
+                model=HuggingFaceCrossEncoder(model_name=RERANKER_MODEL, model_kwargs={"device": "cpu"}),
+                top_n=RETRIEVER_K
+            )
+        )
     
-    # Constrói a cadeia RAG usando LCEL:
-    # 1. Recebe a pergunta e passa para as chaves 'context' e 'question'.
-    # 2. O 'context' é preenchido pelo retriever, o 'question' é a pergunta original.
-    # 3. Passa para o prompt formatado.
-    # 4. Envia para o LLM.
-    # 5. Analisa a saída como string.
+    # Constrói a cadeia de geração usando LCEL (a recuperação fica fora dela, em answer_question,
+    # para rodar em paralelo com o aquecimento do Ollama):
+    # 1. Recebe o 'context' (trechos limitados a CONTEXT_MAX_TOKENS) e a 'question' original.
+    # 2. Passa para o prompt formatado.
+    # 3. Envia para o LLM.
+    # 4. Analisa a saída como string.
     
-    rag_chain = (
-        {"context": retriever, "question": RunnablePassthrough()}
-        | prompt
-        | llm
-        | StrOutputParser()
-    )
+    rag_chain = prompt | llm | StrOutputParser()
     
-    return rag_chain
+    # 5. Aquecimento: carrega o LLM (gerando um único token) e o modelo de embedding já na inicialização,
+    # para que a primeira pergunta real não pague o tempo de carga no Ollama. Falha aqui não impede a subida.
+    try:
+        llm.invoke("ok", num_predict=1)
+        embeddings.embed_query("warmup")
+        _llm_last_used = time.monotonic()
+        print("✅ Modelos aquecidos no Ollama.")
+    except Exception as e:
+        print(f"⚠️ Falha ao aquecer os modelos no Ollama: {e}")
+    
+    return retriever, rag_chain, embeddings
+
+
+# --- Recuperação em Paralelo com o Aquecimento do LLM ---
+
+# Cliente HTTP assíncrono (conexões keep-alive reaproveitadas) usado no aquecimento do Ollama
+ollama_client = httpx.AsyncClient(base_url=LLM_API_URL, limits=OLLAMA_HTTP_LIMITS, timeout=60.0)
+_llm_last_used = 0.0
+
+async def warm_up_llm():
+    """Carrega o modelo no Ollama (prompt vazio), se ele pode ter sido descarregado por ociosidade."""
+    global _llm_last_used
+    if time.monotonic() - _llm_last_used < OLLAMA_WARMUP_INTERVAL:
+        return
+    _llm_last_used = time.monotonic()
+    try:
+        response = await ollama_client.post(
+            "/api/generate",
+            json={"model": OLLAMA_MODEL, "prompt": "", "keep_alive": OLLAMA_KEEP_ALIVE}
+        )
+        response.raise_for_status()
+    except httpx.HTTPError as e:
+        # Apenas otimização: a geração carrega o modelo de qualquer forma
+        print(f"⚠️ Falha ao aquecer o LLM: {e}")
 
-# Inicializa o agente na inicialização do FastAPI
-# A tipagem é Any aqui porque a cadeia LCEL não é estritamente RetrievalQA.
-rag_chain: Optional[any] = None 
+async def retrieve_context(retriever, query: str) -> str:
+    """Busca o contexto enquanto aquece o LLM e o formata dentro do orçamento de tokens."""
+    docs, _ = await asyncio.gather(retriever.ainvoke(query), warm_up_llm())
+    return format_docs(docs)
+
+async def answer_question(retriever, rag_chain, query: str) -> str:
+    """Busca o contexto (em paralelo com o aquecimento do LLM) e, em seguida, gera a resposta."""
+    global _llm_last_used
+    context = await retrieve_context(retriever, query)
+    answer = await rag_chain.ainvoke({"context": context, "question": query})
+    _llm_last_used = time.monotonic()
+    return answer
+
+async def stream_answer(retriever, rag_chain, query: str):
+    """Como answer_question, mas devolve os trechos da resposta à medida que o LLM os gera."""
+    global _llm_last_used
+    context = await retrieve_context(retriever, query)
+    async for chunk in rag_chain.astream({"context": context, "question": query}):
+        yield chunk
+    _llm_last_used = time.monotonic()
+
+
+# --- Cache Semântico (pgvector) ---
+
+def _vector_literal(vector: List[float]) -> str:
+    """Normaliza o vetor (norma 1) e o converte para o literal '[x, y, ...]' do pgvector."""
+    norm = math.sqrt(sum(x * x for x in vector)) or 1.0
+    return "[" + ",".join(repr(x / norm) for x in vector) + "]"
+
+_semantic_cache_ready = False
+
+async def setup_semantic_cache() -> AsyncConnectionPool:
+    """Cria (uma vez) a tabela do cache semântico e o índice HNSW por produto interno; retorna o pool de conexões."""
+    global _semantic_cache_ready
+    pool = await get_db_pool()
+    if not _semantic_cache_ready:
+        async with pool.connection() as conn:
+            await conn.execute("CREATE EXTENSION IF NOT EXISTS vector;")
+            await conn.execute(
+                f"CREATE TABLE IF NOT EXISTS {SEMANTIC_CACHE_TABLE} ("
+                f"id BIGSERIAL PRIMARY KEY, query TEXT NOT NULL, answer TEXT NOT NULL, "
+                f"embedding VECTOR({EMBEDDING_DIMENSION}) NOT NULL);"
+            )
+            # Vetores normalizados: o produto interno (<#>) equivale ao cosseno e é a distância mais barata
+            await conn.execute(
+                f"CREATE INDEX IF NOT EXISTS idx_{SEMANTIC_CACHE_TABLE}_embedding_hnsw "
+                f"ON {SEMANTIC_CACHE_TABLE} USING hnsw (embedding vector_ip_ops);"
+            )
+        _semantic_cache_ready = True
+    return pool
+
+async def lookup_semantic_cache(vector_literal: str) -> Optional[str]:
+    """Retorna a resposta da pergunta mais próxima no cache, se estiver dentro de SEMANTIC_CACHE_MAX_DISTANCE."""
+    pool = await setup_semantic_cache()
+    async with pool.connection() as conn:
+        # <#> é o produto interno negativo: para vetores unitários, 1 + (a <#> b) = distância de cosseno
+        cursor = await conn.execute(
+            f"SELECT answer, 1 + (embedding <#> %s::vector) FROM {SEMANTIC_CACHE_TABLE} "
+            f"ORDER BY embedding <#> %s::vector LIMIT 1;",
+            (vector_literal, vector_literal)
+        )
+        row = await cursor.fetchone()
+    if row and row[1] < SEMANTIC_CACHE_MAX_DISTANCE:
+        return row[0]
+    return None
+
+async def store_semantic_cache(query: str, vector_literal: str, answer: str):
+    """Grava a pergunta, seu embedding e a resposta gerada no cache semântico."""
+    pool = await setup_semantic_cache()
+    async with pool.connection() as conn:
+        await conn.execute(
+            f"INSERT INTO {SEMANTIC_CACHE_TABLE} (query, answer, embedding) VALUES (%s, %s, %s::vector);",
+            (query, answer, vector_literal)
+        )
+
+
+async def check_semantic_cache(embeddings, query: str):
+    """Retorna (resposta em cache ou None, literal do vetor da pergunta ou None se o cache estiver indisponível)."""
+    # O cache é opcional: se estiver indisponível, a pergunta segue direto para a cadeia RAG
+    try:
+        # O embedding (HTTP síncrono ao Ollama) roda no threadpool, sem bloquear o event loop
+        vector_literal = _vector_literal(await run_in_threadpool(embeddings.embed_query, query))
+        return await lookup_semantic_cache(vector_literal), vector_literal
+    except Exception as e:
+        print(f"⚠️ Falha na consulta ao cache semântico: {e}")
+        return None, None
+
+async def save_semantic_cache(query: str, vector_literal: Optional[str], answer: str):
+    """Grava a resposta no cache semântico, se ele estiver disponível (falhas apenas registradas)."""
+    if vector_literal is None:
+        return
+    try:
+        await store_semantic_cache(query, vector_literal, answer)
+    except Exception as e:
+        print(f"⚠️ Falha ao gravar no cache semântico: {e}")
+
+
+# --- Singletons (inicialização preguiçosa) ---
+
+_chain_lock = threading.Lock()
+
+@lru_cache(maxsize=1)
+@retry(
+    stop=stop_after_attempt(INIT_RETRY_ATTEMPTS),
+    wait=wait_exponential(multiplier=1, max=INIT_RETRY_MAX_WAIT),
+    reraise=True
+)
+def _build_chain():
+    """Inicializa os componentes com novas tentativas; só o resultado de sucesso fica memorizado."""
+    return setup_rag_components()
+
+def get_chain():
+    """Retorna (retriever, rag_chain, embeddings), construídos uma única vez (thread-safe) na primeira chamada bem-sucedida."""
+    with _chain_lock:
+        return _build_chain()
+
+# Tenta inicializar já na subida do FastAPI; em caso de falha, o endpoint tenta novamente a cada requisição
 try:
-    rag_chain = setup_rag_components()
+    get_chain()
     print("✅ Agente RAG inicializado com sucesso.")
 except Exception as e:
-    print(f"❌ Erro ao inicializar o Agente RAG. Detalhe: {e}")
-    # Define como None, para o endpoint retornar erro em caso de falha na inicialização
-    rag_chain = None
+    print(f"❌ Erro ao inicializar o Agente RAG (nova tentativa na próxima requisição). Detalhe: {e}")
+
+@app.on_event("startup")
+async def init_semantic_cache():
+    """Abre o pool assíncrono e prepara o cache semântico já na subida (dentro do event loop do uvicorn)."""
+    # O cache é opcional: sem ele, toda pergunta segue direto para a cadeia RAG
+    try:
+        await setup_semantic_cache()
+        print("✅ Cache semântico inicializado com sucesso.")
+    except Exception as e:
+        print(f"⚠️ Cache semântico indisponível (nova tentativa na próxima requisição). Detalhe: {e}")
+
+@app.on_event("shutdown")
+async def close_clients():
+    """Fecha as conexões keep-alive do cliente HTTP do Ollama e o pool do banco vetorial."""
+    await ollama_client.aclose()
+    if _db_pool is not None:
+        await _db_pool.close()
     
 # --- Endpoint da API ---
 
 class QueryInput(BaseModel):
     query: str
 
+async def _get_chain_or_503():
+    """Obtém os componentes RAG ou responde 503 se não puderem ser inicializados."""
+    try:
+        return await run_in_threadpool(get_chain)
+    except Exception as e:
+        raise HTTPException(
+            status_code=503,
+            detail=f"O Agente RAG não pôde ser inicializado. Verifique se o Ollama e o PostgreSQL estão rodando. Detalhe: {e}"
+        )
+
+def _sse_event(data: dict, event: Optional[str] = None) -> str:
+    """Formata um evento Server-Sent Events (dados em JSON: quebras de linha do texto não quebram o evento)."""
+    prefix = f"event: {event}\n" if event else ""
+    return f"{prefix}data: {json.dumps(data, ensure_ascii=False)}\n\n"
+
 @app.post("/ask/")
 async def ask_agent(input: QueryInput):
     """Endpoint para enviar uma consulta ao Agente RAG. A resposta será em Português do Brasil."""
-    if rag_chain is None:
-        return {"error": "O Agente RAG não foi inicializado corretamente. Verifique se o Ollama e o PostgreSQL estão rodando."}
+    retriever, rag_chain, embeddings = await _get_chain_or_503()
         
     try:
-        # Invoca a cadeia LCEL que retorna diretamente a resposta em string (já formatada pelo prompt)
-        answer = rag_chain.invoke(input.query)
+        # 1. Cache semântico: pergunta quase idêntica a uma já respondida dispensa o LLM
+        cached_answer, vector_literal = await check_semantic_cache(embeddings, input.query)
+        if cached_answer is not None:
+            return {"query": input.query, "answer": cached_answer, "cached": True}
+
+        # 2. Busca o contexto (em paralelo com o aquecimento do LLM) e invoca a cadeia LCEL, que retorna
+        # diretamente a resposta em string (já formatada pelo prompt). Assíncrono: a geração no Ollama e a
+        # busca no pgvector cedem o event loop, e as requisições simultâneas se sobrepõem.
+        answer = await answer_question(retriever, rag_chain, input.query)
+        await save_semantic_cache(input.query, vector_literal, answer)
         
         return {
             "query": input.query,
-            "answer": answer 
+            "answer": answer,
+            "cached": False
         }
+    except (OSError, OperationalError, SQLAlchemyOperationalError) as e:
+        # Falha de conexão (Ollama ou PostgreSQL): serviço indisponível, e não erro da consulta
+        raise HTTPException(status_code=503, detail=f"Serviço indisponível durante a execução da chain RAG: {e}")
     except Exception as e:
-        return {"error": f"Erro durante a execução da chain RAG: {e}"}
\ No newline at end of file
+        return {"error": f"Erro durante a execução da chain RAG: {e}"}
+
+@app.post("/ask/stream/")
+async def ask_agent_stream(input: QueryInput):
+    """Como /ask/, mas envia a resposta em streaming (text/event-stream), um evento por trecho gerado pelo LLM.
+
+    Eventos: 'data: {"token": ...}' a cada trecho, 'event: end' ao final (com "cached") e 'event: error' em caso de falha.
+    """
+    retriever, rag_chain, embeddings = await _get_chain_or_503()
+
+    async def eventos():
+        try:
+            cached_answer, vector_literal = await check_semantic_cache(embeddings, input.query)
+            if cached_answer is not None:
+                yield _sse_event({"token": cached_answer})
+                yield _sse_event({"cached": True}, event="end")
+                return
+
+            # O primeiro token chega ao cliente assim que o LLM o gera, sem esperar a resposta completa
+            # (os trechos são acumulados apenas para gravar a resposta no cache semântico)
+            partes = []
+            async for chunk in stream_answer(retriever, rag_chain, input.query):
+                partes.append(chunk)
+                yield _sse_event({"token": chunk})
+            yield _sse_event({"cached": False}, event="end")
+            await save_semantic_cache(input.query, vector_literal, "".join(partes))
+        except Exception as e:
+            # O status HTTP (200) já foi enviado: a falha segue como evento para o cliente
+            yield _sse_event({"error": f"Erro durante a execução da chain RAG: {e}"}, event="error")
+
+    return StreamingResponse(eventos(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
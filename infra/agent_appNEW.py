@@ -132,7 +132,8 @@ async def ask_agent(input: QueryInput):
         
     try:
         # A chain_type_kwargs não é mais necessária aqui, pois foi passada na criação da chain
-        result = rag_chain.invoke({"query": input.query, "language": DEFAULT_LANGUAGE})
+        # ainvoke: a chamada ao LLM e a busca no pgvector não bloqueiam o event loop
+        result = await rag_chain.ainvoke({"query": input.query, "language": DEFAULT_LANGUAGE})
         
         return {
             "query": input.query,
@@ -40,6 +40,18 @@ OLLAMA_MODEL = "llama3" # Modelo LLM principal
 EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "nomic-embed-text") 
 COLLECTION_NAME = "judged_documents" # Nome da coleção PGVector
 
+# Prompt curto em PT-BR no lugar do prompt padrão (em inglês) da chain "stuff":
+# menos tokens de prefill no Llama 3 a cada requisição
+QA_PROMPT = PromptTemplate.from_template(
+    """Você é um assistente jurídico. Responda em Português do Brasil, apenas com base no contexto.
+Se o contexto não bastar, diga que não tem informações suficientes.
+Contexto:
+{context}
+
+Pergunta: {question}
+Resposta:"""
+)
+
 
 # --- Configuração FastAPI ---
 
@@ -83,7 +95,8 @@ def setup_rag_components():
     qa_chain = RetrievalQA.from_chain_type(
         llm=llm, 
         chain_type="stuff", 
-        retriever=retriever
+        retriever=retriever,
+        chain_type_kwargs={"prompt": QA_PROMPT}
     )
     
     return qa_chain
@@ -1,5 +1,5 @@
+from operator import itemgetter
 from langchain_core.prompts import PromptTemplate
-from langchain_core.runnables import RunnablePassthrough
 from langchain_core.output_parsers import StrOutputParser
 from langchain_community.llms import Ollama
 
@@ -9,8 +9,9 @@ prompt = PromptTemplate.from_template(
 
 llm = Ollama(model="llama2")
 
+# itemgetter extrai cada chave da entrada (RunnablePassthrough repassaria o dicionário inteiro para as duas)
 chain = (
-    {"context": RunnablePassthrough(), "question": RunnablePassthrough()}
+    {"context": itemgetter("context"), "question": itemgetter("question")}
     | prompt
     | llm
     | StrOutputParser()
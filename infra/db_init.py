@@ -1,8 +1,11 @@
 # -*- coding: utf-8 -*-
 # db_init.py - Programa de Criação e Otimização da Estrutura do Data Warehouse
 
-import psycopg2
-from psycopg2 import sql
+import psycopg
+from psycopg import sql
+
+# Rotinas de schema compartilhadas com os demais scripts db_init*.py
+from schema_common import verificar_criar_banco, montar_create_table, montar_create_index
 
 # =================================================================
 # 1. CONFIGURAÇÕES E NOMES DE TABELAS
@@ -56,121 +59,108 @@ LAYOUT_ORIGEM = [
     {"campo": "tema", "tipo": "TEXT"}, # Alterado de VARCHAR(400) para TEXT
 ]
 
+# 2. Tabela FATO (Principal - Tratada)
+# Layout da FATO, usando tipos tratados (DATE, TEXT) e referenciando a chave primária
+LAYOUT_FATO = [
+    {"campo": "id_julgado", "tipo": "INTEGER PRIMARY KEY"}, # Chave primária da FATO (ref id_origem)
+    {"campo": "dt_decisao", "tipo": "DATE"}, # Armazena a data tratada
+    {"campo": "dt_publicacao", "tipo": "DATE"}, # Armazena a data tratada
+    {"campo": "classe_sigla", "tipo": "VARCHAR(150)"}, # Ajustado
+    {"campo": "orgao_julgador", "tipo": "VARCHAR(50)"}, # Ajustado
+    {"campo": "ministro_relator", "tipo": "VARCHAR(90)"}, # Ajustado
+    {"campo": "resultado_binario", "tipo": "BOOLEAN"}, 
+    {"campo": "tema_repetitivo", "tipo": "TEXT"}, # Ajustado para TEXT
+    {"campo": "ementa_limpa", "tipo": "TEXT"},
+    {"campo": "decsiao_teor_limpo", "tipo": "TEXT"},
+    {"campo": "tese_juridica_limpa", "tipo": "TEXT"}, # Campo 'tese' na FATO
+    {"campo": "acordaos_similares_limpo", "tipo": "TEXT"},
+    {"campo": "jurisprudencia_citada_limpa", "tipo": "TEXT"},
+    {"campo": "teor_bruto_json", "tipo": "JSONB"} # Para guardar o JSON original (opcional, mas útil)
+]
+
+# 3. Tabela DIMENSIONAL (Referências Legais)
+# id_julgado_fk usa INTEGER para referenciar id_julgado da FATO (INTEGER)
+LAYOUT_DIM_REF = [
+    {"campo": "id_ref_legal", "tipo": "SERIAL PRIMARY KEY"},
+    {"campo": "id_julgado_fk", "tipo": f"INTEGER REFERENCES {TABELA_FATO} (id_julgado)"}, 
+    {"campo": "tipo_norma", "tipo": "VARCHAR(50)"},
+    {"campo": "norma_nome", "tipo": "TEXT"},
+    {"campo": "artigo_dispositivo", "tipo": "TEXT"}
+]
+
+# 4. Tabela DIMENSIONAL (Assuntos/Teses/Termos Auxiliares)
+LAYOUT_DIM_ASSUNTOS = [
+    {"campo": "id_assunto", "tipo": "SERIAL PRIMARY KEY"},
+    {"campo": "id_julgado_fk", "tipo": f"INTEGER REFERENCES {TABELA_FATO} (id_julgado)"}, 
+    {"campo": "tipo_assunto", "tipo": "VARCHAR(50)"},
+    {"campo": "termo", "tipo": "TEXT"}
+]
+
+# Opções físicas da Staging (escrita em lote uma vez, depois só lida pelo ETL):
+# UNLOGGED dispensa o WAL nas cargas e FILLFACTOR 100 enche as páginas (não há UPDATE).
+# Uma tabela UNLOGGED é esvaziada após uma queda do servidor; a Staging é recarregável a partir dos JSON.
+OPCOES_ORIGEM = {"unlogged": True, "fillfactor": 100}
+
+# Tabelas do DW na ordem de criação: (nome, layout, opções físicas).
+# Ordem importa: a FATO precisa existir antes das DIMENSIONAIS (chaves estrangeiras)
+TABELAS_DW = [
+    (TABELA_ORIGEM, LAYOUT_ORIGEM, OPCOES_ORIGEM),
+    (TABELA_FATO, LAYOUT_FATO, {}),
+    (TABELA_DIM_REF, LAYOUT_DIM_REF, {}),
+    (TABELA_DIM_ASSUNTOS, LAYOUT_DIM_ASSUNTOS, {}),
+]
+
+# Índices secundários (tabela, coluna): id_origem é a chave de junção da Staging com a FATO no ETL;
+# dt_decisao atende os filtros por período (ex.: dt_decisao >= '2020-01-01') sem varrer a FATO inteira
+INDICES_DW = [
+    (TABELA_ORIGEM, "id_origem"),
+    (TABELA_FATO, "dt_decisao"),
+]
+
 # =================================================================
 # 2. FUNÇÕES DE CRIAÇÃO DO SCHEMA
 # =================================================================
 
-def verificar_criar_banco():
-    """ Verifica se o banco de dados existe e o cria, se necessário. """
-    try:
-        temp_config = DB_CONFIG.copy()
-        # Conecta ao banco 'postgres' padrão para criar o banco de dados principal
-        temp_config["dbname"] = "postgres" 
-        
-        conn = psycopg2.connect(**temp_config)
-        conn.autocommit = True
-        cursor = conn.cursor()
-
-        cursor.execute(
-            "SELECT 1 FROM pg_database WHERE datname = %s", (DB_CONFIG["dbname"],)
-        )
-        if not cursor.fetchone():
-            print(f"Banco de dados '{DB_CONFIG['dbname']}' não encontrado. Criando...")
-            # Usa sql.Identifier para segurança no nome do DB
-            cursor.execute(sql.SQL("CREATE DATABASE {}").format(sql.Identifier(DB_CONFIG["dbname"])))
-        else:
-            print(f"Banco de dados '{DB_CONFIG['dbname']}' já existe.")
-
-        cursor.close()
-        conn.close()
-    except Exception as e:
-        print(f"Erro ao verificar/criar o banco de dados: {e}")
-
-def criar_tabela(cursor, nome_tabela, layout):
-    """ Função auxiliar para criar qualquer tabela com base em um layout. """
-    cursor.execute(
-        """
-        SELECT EXISTS (
-            SELECT 1
-            FROM information_schema.tables
-            WHERE table_name = %s
-        )
-        """,
-        (nome_tabela,)
-    )
-    
-    if not cursor.fetchone()[0]:
-        print(f"Tabela '{nome_tabela}' não encontrada. Criando...")
-        
-        create_table_query = sql.SQL("CREATE TABLE {} (").format(sql.Identifier(nome_tabela))
-        # Mapeia o layout para comandos de coluna (Nome Tipo)
-        columns = [
-            sql.SQL("{} {}").format(sql.Identifier(col["campo"]), sql.SQL(col["tipo"]))
-            for col in layout
-        ]
-        create_table_query += sql.SQL(", ").join(columns)
-        create_table_query += sql.SQL(");")
-
-        cursor.execute(create_table_query)
-        print(f"Tabela '{nome_tabela}' criada com sucesso.")
+# Comandos CREATE TABLE das tabelas do DW, montados uma única vez na carga do módulo
+_CREATE_TABLE_SQL = {nome: montar_create_table(nome, layout, **opcoes) for nome, layout, opcoes in TABELAS_DW}
+_CREATE_TABELAS_DW_SQL = sql.SQL(" ").join(
+    list(_CREATE_TABLE_SQL.values()) + [montar_create_index(nome, coluna) for nome, coluna in INDICES_DW]
+)
+
+def criar_tabela(cursor, nome_tabela, layout=None):
+    """ 
+    Função auxiliar para criar qualquer tabela com base em um layout.
+    Sem 'layout', usa o comando pré-montado de uma das tabelas do DW.
+    """
+    # IF NOT EXISTS dispensa a consulta prévia ao information_schema (uma ida ao servidor a menos)
+    if layout is None:
+        cursor.execute(_CREATE_TABLE_SQL[nome_tabela])
     else:
-        print(f"Tabela '{nome_tabela}' já existe.")
+        cursor.execute(montar_create_table(nome_tabela, layout))
+    print(f"Tabela '{nome_tabela}' verificada/criada com sucesso.")
 
 def criar_tabelas_dw():
     """ Cria a tabela de origem (judged) e as tabelas FATO e DIMENSIONAIS. """
     conn = None
     try:
-        conn = psycopg2.connect(**DB_CONFIG)
+        conn = psycopg.connect(**DB_CONFIG)
+        # Tabelas já existentes geram um NOTICE ("already exists, skipping") em vez de erro
+        avisos = []
+        conn.add_notice_handler(lambda diag: avisos.append(diag.message_primary))
         cursor = conn.cursor()
 
-        # 1. Tabela de Origem (Staging) - AGORA COMPATÍVEL COM A ESPECIFICAÇÃO
-        print("\n--- 1. Criando Tabela de Origem (Staging) ---")
-        criar_tabela(cursor, TABELA_ORIGEM, LAYOUT_ORIGEM)
-        
-        # 2. Tabela FATO (Principal - Tratada)
-        print("\n--- 2. Criando Tabela FATO para BI/LLM ---")
-        # Layout da FATO, usando tipos tratados (DATE, TEXT) e referenciando a chave primária
-        LAYOUT_FATO = [
-            {"campo": "id_julgado", "tipo": "INTEGER PRIMARY KEY"}, # Chave primária da FATO (ref id_origem)
-            {"campo": "dt_decisao", "tipo": "DATE"}, # Armazena a data tratada
-            {"campo": "dt_publicacao", "tipo": "DATE"}, # Armazena a data tratada
-            {"campo": "classe_sigla", "tipo": "VARCHAR(150)"}, # Ajustado
-            {"campo": "orgao_julgador", "tipo": "VARCHAR(50)"}, # Ajustado
-            {"campo": "ministro_relator", "tipo": "VARCHAR(90)"}, # Ajustado
-            {"campo": "resultado_binario", "tipo": "BOOLEAN"}, 
-            {"campo": "tema_repetitivo", "tipo": "TEXT"}, # Ajustado para TEXT
-            {"campo": "ementa_limpa", "tipo": "TEXT"},
-            {"campo": "decsiao_teor_limpo", "tipo": "TEXT"},
-            {"campo": "tese_juridica_limpa", "tipo": "TEXT"}, # Campo 'tese' na FATO
-            {"campo": "acordaos_similares_limpo", "tipo": "TEXT"},
-            {"campo": "jurisprudencia_citada_limpa", "tipo": "TEXT"},
-            {"campo": "teor_bruto_json", "tipo": "JSONB"} # Para guardar o JSON original (opcional, mas útil)
-        ]
-        criar_tabela(cursor, TABELA_FATO, LAYOUT_FATO)
-        
-        # 3. Tabela DIMENSIONAL (Referências Legais)
-        print("\n--- 3. Criando Tabela DIMENSIONAL de Referências Legais ---")
-        # id_julgado_fk usa INTEGER para referenciar id_julgado da FATO (INTEGER)
-        LAYOUT_DIM_REF = [
-            {"campo": "id_ref_legal", "tipo": "SERIAL PRIMARY KEY"},
-            {"campo": "id_julgado_fk", "tipo": f"INTEGER REFERENCES {TABELA_FATO} (id_julgado)"}, 
-            {"campo": "tipo_norma", "tipo": "VARCHAR(50)"},
-            {"campo": "norma_nome", "tipo": "TEXT"},
-            {"campo": "artigo_dispositivo", "tipo": "TEXT"}
-        ]
-        criar_tabela(cursor, TABELA_DIM_REF, LAYOUT_DIM_REF)
-
-        # 4. Tabela DIMENSIONAL (Assuntos/Teses/Termos Auxiliares)
-        print("\n--- 4. Criando Tabela DIMENSIONAL de Assuntos/Teses ---")
-        LAYOUT_DIM_ASSUNTOS = [
-            {"campo": "id_assunto", "tipo": "SERIAL PRIMARY KEY"},
-            {"campo": "id_julgado_fk", "tipo": f"INTEGER REFERENCES {TABELA_FATO} (id_julgado)"}, 
-            {"campo": "tipo_assunto", "tipo": "VARCHAR(50)"},
-            {"campo": "termo", "tipo": "TEXT"}
-        ]
-        criar_tabela(cursor, TABELA_DIM_ASSUNTOS, LAYOUT_DIM_ASSUNTOS)
-
+        # Os quatro CREATE TABLE e os CREATE INDEX IF NOT EXISTS (pré-montados) seguem em um único comando e uma única transação
+        print("\n--- Criando Tabelas de Origem (Staging), FATO e DIMENSIONAIS ---")
+        cursor.execute(_CREATE_TABELAS_DW_SQL)
         conn.commit()
+
+        for aviso in avisos:
+            print(aviso)
+        for nome in _CREATE_TABLE_SQL:
+            print(f"Tabela '{nome}' verificada/criada com sucesso.")
+        for nome, coluna in INDICES_DW:
+            print(f"Índice da tabela '{nome}' ({coluna}) verificado/criado com sucesso.")
+
         cursor.close()
         conn.close()
         
@@ -185,6 +175,6 @@ def criar_tabelas_dw():
 # =================================================================
 if __name__ == "__main__":
     print("Iniciando a criação e verificação da estrutura do Data Warehouse...")
-    verificar_criar_banco()
+    verificar_criar_banco(DB_CONFIG)
     criar_tabelas_dw()
     print("Processo de criação de estrutura concluído.")
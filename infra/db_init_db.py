@@ -1,10 +1,13 @@
 # -*- coding: utf-8 -*-
 # db_init_staging.py - Criação da Tabela de Staging (judged)
 
-import psycopg2
-from psycopg2 import sql
+import psycopg
+from psycopg import sql
 import sys
 
+# Rotinas de schema compartilhadas com os demais scripts db_init*.py
+from schema_common import verificar_criar_banco, montar_create_table, montar_create_index
+
 # =================================================================
 # 1. CONFIGURAÇÕES E LAYOUT DA TABELA DE STAGING
 # =================================================================
@@ -52,82 +55,41 @@ LAYOUT_ORIGEM = [
     {"campo": "tema", "tipo": "TEXT"}, 
 ]
 
+# Opções físicas da Staging (escrita em lote uma vez, depois só lida pelo ETL):
+# UNLOGGED dispensa o WAL nas cargas e FILLFACTOR 100 enche as páginas (não há UPDATE).
+# Uma tabela UNLOGGED é esvaziada após uma queda do servidor; a Staging é recarregável a partir dos JSON.
+OPCOES_ORIGEM = {"unlogged": True, "fillfactor": 100}
+
+# Coluna indexada na Staging: id_origem é a chave de junção com a FATO no ETL
+INDICE_ORIGEM = "id_origem"
+
 # =================================================================
 # 2. FUNÇÕES DE CRIAÇÃO DO SCHEMA (REDUZIDAS)
 # =================================================================
 
-def verificar_criar_banco():
-    """ Verifica se o banco de dados existe e o cria, se necessário. """
-    try:
-        temp_config = DB_CONFIG.copy()
-        # Conecta ao banco 'postgres' padrão para criar o banco de dados principal
-        temp_config["dbname"] = "postgres" 
-        
-        conn = psycopg2.connect(**temp_config)
-        conn.autocommit = True
-        cursor = conn.cursor()
-
-        cursor.execute(
-            "SELECT 1 FROM pg_database WHERE datname = %s", (DB_CONFIG["dbname"],)
-        )
-        if not cursor.fetchone():
-            print(f"Banco de dados '{DB_CONFIG['dbname']}' não encontrado. Criando...")
-            # Usa sql.Identifier para segurança no nome do DB
-            cursor.execute(sql.SQL("CREATE DATABASE {}").format(sql.Identifier(DB_CONFIG["dbname"])))
-        else:
-            print(f"Banco de dados '{DB_CONFIG['dbname']}' já existe.")
-
-        cursor.close()
-        conn.close()
-        return True
-    except Exception as e:
-        print(f"Erro ao verificar/criar o banco de dados: {e}")
-        return False
-
-def criar_tabela(cursor, nome_tabela, layout):
-    """ Função auxiliar para criar qualquer tabela com base em um layout. """
-    cursor.execute(
-        """
-        SELECT EXISTS (
-            SELECT 1
-            FROM information_schema.tables
-            WHERE table_name = %s
-        )
-        """,
-        (nome_tabela,)
-    )
-    
-    if not cursor.fetchone()[0]:
-        print(f"Tabela '{nome_tabela}' não encontrada. Criando...")
-        
-        create_table_query = sql.SQL("CREATE TABLE {} (").format(sql.Identifier(nome_tabela))
-        # Mapeia o layout para comandos de coluna (Nome Tipo)
-        columns = [
-            sql.SQL("{} {}").format(sql.Identifier(col["campo"]), sql.SQL(col["tipo"]))
-            for col in layout
-        ]
-        create_table_query += sql.SQL(", ").join(columns)
-        create_table_query += sql.SQL(");")
-
-        cursor.execute(create_table_query)
-        print(f"Tabela '{nome_tabela}' criada com sucesso.")
-    else:
-        print(f"Tabela '{nome_tabela}' já existe.")
+# Tabela e índice de id_origem (IF NOT EXISTS: seguro também quando a tabela já existia),
+# montados uma única vez na carga do módulo e enviados em um único cursor.execute (uma ida e volta)
+_CREATE_STAGING_SQL = sql.SQL("\n").join([
+    montar_create_table(TABELA_ORIGEM, LAYOUT_ORIGEM, **OPCOES_ORIGEM),
+    montar_create_index(TABELA_ORIGEM, INDICE_ORIGEM),
+])
 
 def criar_tabela_staging():
     """ Cria a tabela de origem (judged). """
     conn = None
-    if not verificar_criar_banco():
+    if not verificar_criar_banco(DB_CONFIG):
         print("Não foi possível continuar sem um banco de dados válido.")
         return
 
     try:
-        conn = psycopg2.connect(**DB_CONFIG)
+        conn = psycopg.connect(**DB_CONFIG)
         cursor = conn.cursor()
 
         # Tabela de Origem (Staging)
         print("\n--- 1. Criando Tabela de Origem (Staging: judged) ---")
-        criar_tabela(cursor, TABELA_ORIGEM, LAYOUT_ORIGEM)
+        cursor.execute(_CREATE_STAGING_SQL)
+        print(f"Tabela '{TABELA_ORIGEM}' verificada/criada com sucesso.")
+        print(f"Índice da tabela '{TABELA_ORIGEM}' ({INDICE_ORIGEM}) verificado/criado com sucesso.")
         
         conn.commit()
         cursor.close()
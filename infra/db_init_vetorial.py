@@ -0,0 +1,245 @@
+# -*- coding: utf-8 -*-
+# db_init_vetorial.py - Criação da Tabela Vetorial (DIM_VETORES_LLM) e do índice HNSW no judged_llm_db
+
+import psycopg
+from psycopg import sql
+import sys
+
+# Rotinas de schema compartilhadas com os demais scripts db_init*.py
+from schema_common import verificar_criar_banco, criar_tabela
+
+# =================================================================
+# 1. CONFIGURAÇÕES E LAYOUT DA TABELA VETORIAL
+# =================================================================
+DB_CONFIG = {
+    "host": "localhost",
+    "port": 5433,         # Porta externa mapeada do judged_llm_db (Vetorial)
+    "dbname": "vector_storage",
+    "user": "admin",
+    "password": "admin"
+}
+
+# Nome da Tabela Vetorial (minúsculo: o load-datavector.py usa o nome sem aspas,
+# que o PostgreSQL converte para minúsculas)
+TABELA_VETORIAL = "dim_vetores_llm"
+
+# Deve ser a mesma dimensão usada em 'load-datavector.py'
+DIMENSAO_VETOR = 768
+
+# Parâmetros do índice HNSW (pgvector) por faixa de volume. Diferente do IVFFlat, o HNSW não
+# precisa de "treino" (lists) e é incremental: continua válido à medida que novos vetores são inseridos.
+#   m               -> vizinhos por nó do grafo
+#   ef_construction -> largura da busca durante a construção
+#   ef_search       -> largura da busca nas consultas (gravada como padrão do banco)
+# Cada faixa vale até o limite (exclusivo) de vetores; None = sem limite.
+FAIXAS_HNSW = [
+    (100_000, {"m": 16, "ef_construction": 64, "ef_search": 40}),
+    (1_000_000, {"m": 24, "ef_construction": 100, "ef_search": 100}),
+    (None, {"m": 32, "ef_construction": 128, "ef_search": 200}),
+]
+
+# Nome do índice HNSW do embedding
+INDICE_HNSW = f"idx_{TABELA_VETORIAL}_embedding_hnsw"
+
+# Recursos da sessão para a construção (paralela) do grafo HNSW
+MAINTENANCE_WORK_MEM = "2GB"
+MAX_PARALLEL_MAINTENANCE_WORKERS = 7
+
+# Armazenamento da tabela vetorial: folga de 10% nas páginas para os UPSERTs da carga (atualizações HOT)
+# e autovacuum mais frequente, mantendo a tabela e o grafo HNSW sem linhas mortas acumuladas.
+FILLFACTOR_VETORIAL = 90
+AUTOVACUUM_VACUUM_SCALE_FACTOR = 0.05
+
+# Layout da Tabela Vetorial (colunas usadas pelo load-datavector.py)
+# id_julgado_fk é a PRIMARY KEY exigida pelo UPSERT (ON CONFLICT) da carga.
+# O embedding é HALFVEC (float16, pgvector >= 0.7): metade do espaço do VECTOR (float32) na tabela,
+# no grafo HNSW e no cache, com perda de recall desprezível. Aceita o mesmo texto '[x, y, ...]' na carga.
+LAYOUT_VETORIAL = [
+    {"campo": "id_julgado_fk", "tipo": "INTEGER PRIMARY KEY"},
+    {"campo": "texto_fonte", "tipo": "TEXT"},
+    {"campo": "tipo_fonte", "tipo": "VARCHAR(50)"},
+    {"campo": "embedding", "tipo": f"HALFVEC({DIMENSAO_VETOR})"},
+]
+
+# Tabela de embeddings criada pelo PGVector do LangChain (coleção 'judged_documents' do agent_app.py).
+# O agente consulta por produto interno (<#>, vetores do nomic-embed-text normalizados), então o
+# índice HNSW usa halfvec_ip_ops. O embedding é convertido para HALFVEC(768) (float16, como a tabela
+# vetorial): metade dos bytes por comparação e do grafo em memória. O HNSW exige dimensão fixa na coluna.
+TABELA_LANGCHAIN = "langchain_pg_embedding"
+INDICE_HNSW_LANGCHAIN = f"idx_{TABELA_LANGCHAIN}_embedding_hnsw_ip"
+PARAMETROS_HNSW_LANGCHAIN = {"m": 16, "ef_construction": 64}
+
+# Busca híbrida do agente (vetorial + textual): coluna tsvector gerada a partir do texto do trecho
+# e índice GIN, para termos exatos (números de artigos, nomes de ministros) que a busca densa perde.
+CONFIG_TEXTUAL = "portuguese"
+COLUNA_TSV_LANGCHAIN = "doc_tsv"
+INDICE_GIN_LANGCHAIN = f"idx_{TABELA_LANGCHAIN}_{COLUNA_TSV_LANGCHAIN}_gin"
+
+# =================================================================
+# 2. FUNÇÕES DE CRIAÇÃO DO SCHEMA
+# =================================================================
+
+def configurar_parametros_hnsw(total_vetores):
+    """ Escolhe m, ef_construction e ef_search do HNSW conforme a quantidade de vetores. """
+    for limite, parametros in FAIXAS_HNSW:
+        if limite is None or total_vetores < limite:
+            return parametros
+    return FAIXAS_HNSW[-1][1]
+
+def criar_indice_vetorial(cursor):
+    """ Cria (se não existir) o índice HNSW do embedding, dimensionado pelo volume atual da tabela. """
+    # O índice só é construído se ainda não existir: para redimensioná-lo após uma carga grande,
+    # exclua o índice (remover_indice_vetorial) e execute novamente.
+    cursor.execute(sql.SQL("SELECT count(*) FROM {};").format(sql.Identifier(TABELA_VETORIAL)))
+    total_vetores = cursor.fetchone()[0]
+    parametros = configurar_parametros_hnsw(total_vetores)
+    print(f"Vetores na tabela: {total_vetores:,}. Parâmetros HNSW escolhidos: {parametros}")
+
+    # Memória e workers extras apenas nesta sessão, para construir o grafo em paralelo
+    cursor.execute(sql.SQL("SET maintenance_work_mem = {};").format(sql.Literal(MAINTENANCE_WORK_MEM)))
+    cursor.execute(sql.SQL("SET max_parallel_maintenance_workers = {};").format(
+        sql.Literal(int(MAX_PARALLEL_MAINTENANCE_WORKERS))
+    ))
+    cursor.execute(sql.SQL(
+        "CREATE INDEX IF NOT EXISTS {} ON {} USING hnsw (embedding halfvec_l2_ops) "
+        "WITH (m = {}, ef_construction = {});"
+    ).format(
+        sql.Identifier(INDICE_HNSW),
+        sql.Identifier(TABELA_VETORIAL),
+        sql.Literal(int(parametros["m"])),
+        sql.Literal(int(parametros["ef_construction"])),
+    ))
+    print(f"Índice HNSW (m={parametros['m']}, ef_construction={parametros['ef_construction']}) verificado/criado com sucesso.")
+
+    # ef_search passa a ser o padrão de todas as novas sessões do banco
+    cursor.execute(sql.SQL("ALTER DATABASE {} SET hnsw.ef_search = {};").format(
+        sql.Identifier(DB_CONFIG["dbname"]), sql.Literal(int(parametros["ef_search"]))
+    ))
+    print(f"hnsw.ef_search = {parametros['ef_search']} definido para o banco '{DB_CONFIG['dbname']}'.")
+
+def remover_indice_vetorial(cursor):
+    """ Exclui o índice HNSW do embedding (antes de uma carga em massa). """
+    cursor.execute(sql.SQL("DROP INDEX IF EXISTS {};").format(sql.Identifier(INDICE_HNSW)))
+    print(f"Índice HNSW '{INDICE_HNSW}' excluído.")
+
+def executar_manutencao_indice(funcao):
+    """ Executa criar_indice_vetorial ou remover_indice_vetorial em uma conexão própria (usado pela carga vetorial). """
+    conn = None
+    try:
+        conn = psycopg.connect(**DB_CONFIG)
+        cursor = conn.cursor()
+        funcao(cursor)
+        conn.commit()
+        cursor.close()
+    except Exception as e:
+        print(f"Erro na manutenção do índice vetorial: {e}")
+        if conn:
+            conn.rollback()
+        raise
+    finally:
+        if conn:
+            conn.close()
+
+def criar_tabela_vetorial():
+    """ Cria a extensão pgvector, a tabela vetorial e o índice HNSW do embedding. """
+    conn = None
+    if not verificar_criar_banco(DB_CONFIG):
+        print("Não foi possível continuar sem um banco de dados válido.")
+        return
+
+    try:
+        conn = psycopg.connect(**DB_CONFIG)
+        cursor = conn.cursor()
+
+        print("\n--- 1. Criando Extensão pgvector e Tabela Vetorial ---")
+        cursor.execute("CREATE EXTENSION IF NOT EXISTS vector;")
+        criar_tabela(cursor, TABELA_VETORIAL, LAYOUT_VETORIAL)
+        # ALTER TABLE: aplica também a tabelas já existentes
+        cursor.execute(sql.SQL("ALTER TABLE {} SET (fillfactor = {}, autovacuum_vacuum_scale_factor = {});").format(
+            sql.Identifier(TABELA_VETORIAL),
+            sql.Literal(int(FILLFACTOR_VETORIAL)),
+            sql.Literal(float(AUTOVACUUM_VACUUM_SCALE_FACTOR)),
+        ))
+        print(f"Tabela '{TABELA_VETORIAL}': fillfactor = {FILLFACTOR_VETORIAL}, autovacuum_vacuum_scale_factor = {AUTOVACUUM_VACUUM_SCALE_FACTOR}.")
+
+        print("\n--- 2. Criando Índice HNSW do Embedding ---")
+        criar_indice_vetorial(cursor)
+
+        conn.commit()
+        cursor.close()
+        conn.close()
+
+    except Exception as e:
+        print(f"Erro ao criar a estrutura vetorial: {e}")
+        if conn:
+            conn.rollback()
+
+
+def criar_indice_langchain():
+    """ Converte o embedding do LangChain para HALFVEC(768) e cria (CONCURRENTLY) os índices HNSW (produto interno) e GIN (textual). """
+    conn = None
+    try:
+        conn = psycopg.connect(**DB_CONFIG)
+        # CREATE INDEX CONCURRENTLY não roda dentro de transação; também não bloqueia as gravações do agente
+        conn.autocommit = True
+        cursor = conn.cursor()
+
+        # A tabela só existe depois da primeira inicialização do agent_app.py
+        cursor.execute("SELECT to_regclass(%s);", (TABELA_LANGCHAIN,))
+        if cursor.fetchone()[0] is None:
+            print(f"Tabela '{TABELA_LANGCHAIN}' ainda não existe (inicie o agente). Índice não criado.")
+            return
+
+        # Conversão única: o índice antigo (vector_ip_ops) não serve para halfvec e é recriado abaixo
+        tipo_halfvec = f"halfvec({int(DIMENSAO_VETOR)})"
+        cursor.execute(
+            "SELECT format_type(atttypid, atttypmod) FROM pg_attribute "
+            "WHERE attrelid = to_regclass(%s) AND attname = 'embedding';",
+            (TABELA_LANGCHAIN,)
+        )
+        if cursor.fetchone()[0] != tipo_halfvec:
+            cursor.execute(sql.SQL("DROP INDEX CONCURRENTLY IF EXISTS {};").format(sql.Identifier(INDICE_HNSW_LANGCHAIN)))
+            cursor.execute(sql.SQL("ALTER TABLE {} ALTER COLUMN embedding TYPE {} USING embedding::{};").format(
+                sql.Identifier(TABELA_LANGCHAIN), sql.SQL(tipo_halfvec), sql.SQL(tipo_halfvec)
+            ))
+            print(f"Coluna embedding de '{TABELA_LANGCHAIN}' convertida para {tipo_halfvec}.")
+        cursor.execute(sql.SQL("SET maintenance_work_mem = {};").format(sql.Literal(MAINTENANCE_WORK_MEM)))
+        cursor.execute(sql.SQL(
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS {} ON {} USING hnsw (embedding halfvec_ip_ops) "
+            "WITH (m = {}, ef_construction = {});"
+        ).format(
+            sql.Identifier(INDICE_HNSW_LANGCHAIN),
+            sql.Identifier(TABELA_LANGCHAIN),
+            sql.Literal(int(PARAMETROS_HNSW_LANGCHAIN["m"])),
+            sql.Literal(int(PARAMETROS_HNSW_LANGCHAIN["ef_construction"])),
+        ))
+        print(f"Índice HNSW (halfvec_ip_ops) de '{TABELA_LANGCHAIN}' verificado/criado com sucesso.")
+
+        # Coluna tsvector gerada (mantida pelo próprio PostgreSQL a cada INSERT do LangChain) e índice GIN
+        cursor.execute(sql.SQL(
+            "ALTER TABLE {} ADD COLUMN IF NOT EXISTS {} tsvector "
+            "GENERATED ALWAYS AS (to_tsvector({}, coalesce(document, ''))) STORED;"
+        ).format(
+            sql.Identifier(TABELA_LANGCHAIN), sql.Identifier(COLUNA_TSV_LANGCHAIN), sql.Literal(CONFIG_TEXTUAL)
+        ))
+        cursor.execute(sql.SQL("CREATE INDEX CONCURRENTLY IF NOT EXISTS {} ON {} USING gin ({});").format(
+            sql.Identifier(INDICE_GIN_LANGCHAIN), sql.Identifier(TABELA_LANGCHAIN), sql.Identifier(COLUNA_TSV_LANGCHAIN)
+        ))
+        print(f"Coluna '{COLUNA_TSV_LANGCHAIN}' e índice GIN de '{TABELA_LANGCHAIN}' verificados/criados com sucesso.")
+        cursor.close()
+
+    except Exception as e:
+        print(f"Erro ao criar o índice da tabela do LangChain: {e}")
+    finally:
+        if conn:
+            conn.close()
+
+
+# =================================================================
+# 3. EXECUÇÃO
+# =================================================================
+if __name__ == "__main__":
+    print("Iniciando a criação da estrutura vetorial...")
+    criar_tabela_vetorial()
+    criar_indice_langchain()
+    print("Processo de criação da estrutura vetorial concluído.")
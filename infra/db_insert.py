@@ -2,11 +2,14 @@
 # data/db_insert.py - Rotina de Inserção de Dados em Lote (Batch Insert)
 # Espera que o lote de dados já esteja tratado e padronizado pelo script de ETL.
 
-import psycopg2
-from psycopg2 import sql, extras
+import psycopg
+from psycopg import sql
+from psycopg_pool import ConnectionPool
 import sys
 import os 
-from typing import List, Dict, Any
+import operator
+from functools import lru_cache
+from typing import List, Dict, Any, Tuple
 
 # --- Configurações do banco de dados ---
 DB_CONFIG = {
@@ -17,13 +20,83 @@ DB_CONFIG = {
     "password": "admin"
 }
 
+# Execuções de um mesmo comando a partir das quais o psycopg passa a usar prepared statement no servidor
+PREPARE_THRESHOLD = 5
+
+# Pool de conexões persistentes reaproveitadas entre os lotes (sem novo handshake/autenticação a cada chamada)
+POOL_MIN_CONEXOES = 1
+POOL_MAX_CONEXOES = 8
+_POOL: ConnectionPool | None = None
+
+def _obter_pool() -> ConnectionPool:
+    """ Retorna o pool de conexões do módulo, abrindo-o na primeira chamada (após um eventual fork do processo). """
+    global _POOL
+    if _POOL is None:
+        _POOL = ConnectionPool(
+            kwargs={**DB_CONFIG, "prepare_threshold": PREPARE_THRESHOLD},
+            min_size=POOL_MIN_CONEXOES, max_size=POOL_MAX_CONEXOES, open=True
+        )
+    return _POOL
+
 # Nome da tabela de Staging (área de carregamento)
 TABLE_NAME = "judged"
 
+# A partir deste tamanho de lote a carga usa COPY ... FROM STDIN (protocolo de cópia, sem
+# análise de um INSERT por página); lotes menores usam um único INSERT ... SELECT unnest(...).
+COPY_THRESHOLD = 1000
+
+# Cache dos tipos das colunas por tabela (nome da coluna -> tipo SQL), lidos do catálogo uma única vez
+_TIPOS_COLUNAS_CACHE: Dict[str, Dict[str, str]] = {}
+
+def _obter_tipos_colunas(cursor, nome_tabela):
+    """ Retorna (com cache) os tipos base das colunas de uma tabela, no formato aceito por um cast (ex: 'character varying'). """
+    tipos = _TIPOS_COLUNAS_CACHE.get(nome_tabela)
+    if tipos is None:
+        # Tipo base, sem o modificador (atttypmod): um cast explícito para varchar(n) truncaria o valor
+        # em silêncio, enquanto a atribuição do INSERT à coluna valida o tamanho e falha, como no COPY
+        cursor.execute(
+            "SELECT attname, format_type(atttypid, NULL) FROM pg_attribute "
+            "WHERE attrelid = to_regclass(%s) AND attnum > 0 AND NOT attisdropped",
+            (nome_tabela,)
+        )
+        tipos = _TIPOS_COLUNAS_CACHE[nome_tabela] = dict(cursor.fetchall())
+    return tipos
+
+# --- Comandos e extratores cacheados por lista de colunas (o layout não muda entre os lotes) ---
+
+@lru_cache(maxsize=8)
+def _extrator_linhas(colunas: Tuple[str, ...]):
+    """ Retorna um itemgetter que extrai a tupla de valores de um registro na ordem das colunas. """
+    if len(colunas) == 1:
+        # itemgetter com uma única chave devolve o valor, não uma tupla
+        coluna = colunas[0]
+        return lambda dados: (dados[coluna],)
+    return operator.itemgetter(*colunas)
+
+@lru_cache(maxsize=8)
+def _montar_copy(colunas: Tuple[str, ...]) -> sql.Composed:
+    """ Monta o comando COPY ... FROM STDIN da tabela de staging para as colunas informadas. """
+    return sql.SQL("COPY {} ({}) FROM STDIN").format(
+        sql.Identifier(TABLE_NAME), sql.SQL(', ').join(map(sql.Identifier, colunas))
+    )
+
+@lru_cache(maxsize=8)
+def _montar_insert_unnest(colunas: Tuple[str, ...], tipos: Tuple[str, ...]) -> sql.Composed:
+    """ Monta o INSERT ... SELECT * FROM unnest(%s::tipo[], ...) com o cast de cada array para o tipo da coluna. """
+    return sql.SQL("INSERT INTO {} ({}) SELECT * FROM unnest({})").format(
+        sql.Identifier(TABLE_NAME), sql.SQL(', ').join(map(sql.Identifier, colunas)),
+        sql.SQL(', ').join(sql.SQL("%s::{}[]").format(sql.SQL(tipo)) for tipo in tipos)
+    )
+
 def inserir_dados_lote(lote_de_dados: List[Dict[str, Any]]):
     """
-    Insere uma lista de registros tratados usando psycopg2.extras.execute_values 
-    para alta performance (Batch Insert) na tabela de staging 'judged'.
+    Insere uma lista de registros tratados na tabela de staging 'judged' para alta
+    performance (Batch Insert): COPY para lotes a partir de COPY_THRESHOLD registros
+    e um único INSERT ... SELECT * FROM unnest(...) (um array por coluna) para os menores.
+    
+    DURABILIDADE: cada lote roda com synchronous_commit = off (o commit não espera o flush do WAL)
+    e com as constraints DEFERRABLE verificadas apenas no commit. Uma queda do servidor pode perder
+    os últimos lotes confirmados (nunca corrompe o banco); basta reprocessar os arquivos do log do ETL.
     
     PREMISSA: O lote_de_dados recebido pelo ETL (process_data.py) já deve ter suas
     chaves padronizadas para os nomes das colunas do banco de dados, incluindo 
@@ -38,27 +111,33 @@ def inserir_dados_lote(lote_de_dados: List[Dict[str, Any]]):
     try:
         # 1. Obtém os nomes das colunas (chaves do dicionário) do primeiro registro.
         # Estas chaves devem corresponder EXATAMENTE aos nomes das colunas no DB.
-        colunas_db = list(lote_de_dados[0].keys())
+        colunas_db = tuple(lote_de_dados[0].keys())
+        extrair_linha = _extrator_linhas(colunas_db)
         
-        # 2. Cria a lista de tuplas de valores (garantindo a ordem)
-        valores_tuplas = []
-        for dados_tratados in lote_de_dados:
-            # Extrai os valores na ordem das chaves, garantindo a compatibilidade com a ordem das colunas_db.
-            tupla_valores = tuple(dados_tratados[c] for c in colunas_db)
-            valores_tuplas.append(tupla_valores)
-
-        # Conecta ao banco de dados
-        conn = psycopg2.connect(**DB_CONFIG)
+        # Obtém uma conexão do pool
+        conn = _obter_pool().getconn()
         cursor = conn.cursor()
 
-        # Monta o comando SQL para inserção usando execute_values
-        insert_query = sql.SQL("INSERT INTO {} ({}) VALUES %s").format(
-            sql.Identifier(TABLE_NAME),
-            sql.SQL(', ').join(map(sql.Identifier, colunas_db))
-        )
+        # Ajustes válidos apenas nesta transação (SET LOCAL): commit assíncrono e FKs adiáveis no commit
+        cursor.execute("SET LOCAL synchronous_commit = off", prepare=False)
+        cursor.execute("SET CONSTRAINTS ALL DEFERRED", prepare=False)
 
-        # 3. Executa o comando de inserção em lote (transacional)
-        extras.execute_values(cursor, insert_query, valores_tuplas, page_size=1000)
+        # 2. Executa o comando de inserção em lote (transacional)
+        if len(lote_de_dados) >= COPY_THRESHOLD:
+            # Lotes grandes: API nativa de COPY do psycopg, uma linha por vez na ordem das colunas_db
+            # (a serialização e o escape dos valores ficam a cargo do driver)
+            with cursor.copy(_montar_copy(colunas_db)) as copy:
+                for linha in map(extrair_linha, lote_de_dados):
+                    copy.write_row(linha)
+        else:
+            # Lotes menores: uma lista (array) por coluna e um único INSERT ... SELECT unnest(...).
+            # O custo de planejamento é constante, ao contrário do VALUES, que cresce com o número de linhas.
+            # zip(*linhas) transpõe as tuplas de registros em colunas
+            valores_colunas = [list(coluna) for coluna in zip(*map(extrair_linha, lote_de_dados))]
+            tipos = _obter_tipos_colunas(cursor, TABLE_NAME)
+            # Coluna desconhecida: text, e o DB acusa o erro
+            insert_query = _montar_insert_unnest(colunas_db, tuple(tipos.get(c, "text") for c in colunas_db))
+            cursor.execute(insert_query, valores_colunas)
         
         conn.commit()
         cursor.close()
@@ -74,7 +153,7 @@ def inserir_dados_lote(lote_de_dados: List[Dict[str, Any]]):
         
     finally:
         if conn:
-            conn.close()
+            _POOL.putconn(conn) # Devolve a conexão ao pool em vez de fechá-la
 
 # --- Códigos Auxiliares que podem ser usados em outros sistemas ---
 
@@ -84,10 +163,10 @@ def testar_conexao():
     """
     conn = None
     try:
-        conn = psycopg2.connect(**DB_CONFIG)
+        conn = psycopg.connect(**DB_CONFIG)
         print("Conexão com PostgreSQL estabelecida com sucesso.")
         return True
-    except psycopg2.Error as e:
+    except psycopg.Error as e:
         print(f"Erro ao conectar ao PostgreSQL: {e}", file=sys.stderr)
         return False
     finally:
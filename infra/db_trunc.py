@@ -1,5 +1,5 @@
-import psycopg2
-from psycopg2 import sql
+import psycopg
+from psycopg import sql
 
 # Configurações do banco de dados
 DB_CONFIG = {
@@ -17,7 +17,7 @@ TABLE_NAME = "judged"
 def deletar_tabela():
     try:
         # Conecta ao banco de dados
-        conn = psycopg2.connect(**DB_CONFIG)
+        conn = psycopg.connect(**DB_CONFIG)
         cursor = conn.cursor()
 
         # Monta o comando SQL para deletar a tabela
@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+# schema_common.py - Rotinas de schema compartilhadas pelos scripts db_init*.py
+
+import re
+import psycopg
+from psycopg import sql
+
+# Captura o nome da tabela referenciada por uma chave estrangeira no "tipo" de uma coluna do layout
+_REFERENCES_RE = re.compile(r'\bREFERENCES\s+"?(\w+)"?', re.IGNORECASE)
+
+# =================================================================
+# FUNÇÕES COMPARTILHADAS DE CRIAÇÃO DO SCHEMA
+# =================================================================
+
+def verificar_criar_banco(db_config):
+    """ Verifica se o banco de dados existe e o cria, se necessário. """
+    try:
+        temp_config = db_config.copy()
+        # Conecta ao banco 'postgres' padrão para criar o banco de dados principal
+        temp_config["dbname"] = "postgres"
+
+        conn = psycopg.connect(**temp_config)
+        conn.autocommit = True
+        cursor = conn.cursor()
+
+        # CREATE DATABASE direto (não aceita IF NOT EXISTS): o erro DuplicateDatabase indica que o banco já existe,
+        # dispensando a consulta prévia ao catálogo pg_database (uma ida ao servidor a menos)
+        try:
+            # Usa sql.Identifier para segurança no nome do DB
+            cursor.execute(sql.SQL("CREATE DATABASE {}").format(sql.Identifier(db_config["dbname"])))
+            print(f"Banco de dados '{db_config['dbname']}' não encontrado. Criado.")
+        except psycopg.errors.DuplicateDatabase:
+            print(f"Banco de dados '{db_config['dbname']}' já existe.")
+
+        cursor.close()
+        conn.close()
+        return True
+    except Exception as e:
+        print(f"Erro ao verificar/criar o banco de dados: {e}")
+        return False
+
+def montar_create_table(nome_tabela, layout, unlogged=False, fillfactor=None):
+    """ Monta o comando 'CREATE TABLE IF NOT EXISTS' de uma tabela com base em um layout. """
+    # Mapeia o layout para comandos de coluna (Nome Tipo)
+    columns = [
+        sql.SQL("{} {}").format(sql.Identifier(col["campo"]), sql.SQL(col["tipo"]))
+        for col in layout
+    ]
+    create_table_query = sql.SQL("CREATE {}TABLE IF NOT EXISTS {} ({})").format(
+        sql.SQL("UNLOGGED " if unlogged else ""), sql.Identifier(nome_tabela), sql.SQL(", ").join(columns)
+    )
+    if fillfactor is not None:
+        create_table_query += sql.SQL(" WITH (fillfactor = {})").format(sql.Literal(int(fillfactor)))
+    return create_table_query + sql.SQL(";")
+
+def montar_create_index(nome_tabela, coluna):
+    """ Monta o comando 'CREATE INDEX IF NOT EXISTS' (idx_<tabela>_<coluna>) de uma coluna. """
+    return sql.SQL("CREATE INDEX IF NOT EXISTS {} ON {} ({});").format(
+        sql.Identifier(f"idx_{nome_tabela}_{coluna}".lower()), sql.Identifier(nome_tabela), sql.Identifier(coluna)
+    )
+
+def criar_tabela(cursor, nome_tabela, layout, **opcoes):
+    """ Função auxiliar para criar qualquer tabela com base em um layout (opções: unlogged, fillfactor). """
+    # IF NOT EXISTS dispensa a consulta prévia ao information_schema (uma ida ao servidor a menos)
+    cursor.execute(montar_create_table(nome_tabela, layout, **opcoes))
+    print(f"Tabela '{nome_tabela}' verificada/criada com sucesso.")
+
+def ordenar_por_dependencia(layouts):
+    """ Ordena [(nome_tabela, layout)] pelas chaves estrangeiras (REFERENCES): tabelas referenciadas primeiro. """
+    nomes = [nome for nome, _ in layouts]
+    dependencias = {
+        nome: {ref for col in layout for ref in _REFERENCES_RE.findall(col["tipo"]) if ref in nomes and ref != nome}
+        for nome, layout in layouts
+    }
+    ordenados = []
+    pendentes = list(layouts)
+    # Ordenação topológica estável: a cada passada emite as tabelas cujas referências já foram criadas
+    while pendentes:
+        prontos = [(nome, layout) for nome, layout in pendentes if dependencias[nome] <= {n for n, _ in ordenados}]
+        if not prontos:
+            raise ValueError(f"Dependência circular entre as tabelas: {', '.join(n for n, _ in pendentes)}")
+        ordenados.extend(prontos)
+        pendentes = [item for item in pendentes if item not in prontos]
+    return ordenados
@@ -1,14 +1,21 @@
 # -*- coding: utf-8 -*-
 # load-datalake.py - Processo ETL para modelagem de Fato e Dimensões (STJ)
-# Versão robusta para alto volume: Usa Cursors Separados e de Servidor com 'withhold=True'.
+# Versão robusta para alto volume: leitura da Staging por cursor de servidor em conexão própria (sem WITH HOLD),
+# escrita em lotes por outra conexão do pool.
 
 import psycopg2
+from psycopg2 import sql
+from psycopg2.pool import ThreadedConnectionPool
+import io
 import json
 import re
 import os
 import sys
 import logging
-from datetime import datetime
+import multiprocessing
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime
 from typing import List, Dict, Any, Tuple
 
 # =================================================================
@@ -28,6 +35,47 @@ TABELA_FATO = "FATO_JULGADOS_STJ"
 TABELA_DIM_REF = "DIM_REFERENCIAS_LEGAIS"
 TABELA_DIM_ASSUNTOS = "DIM_ASSUNTOS_STJ"
 
+# Chaves de conflito do UPSERT (ON CONFLICT) de cada tabela do DW
+CHAVES_CONFLITO = {
+    TABELA_FATO: ["ID_JULGADO"],
+    TABELA_DIM_REF: ["ID_JULGADO_FK", "TIPO_NORMA", "NORMA_NOME", "ARTIGO_DISPOSITIVO"],
+    TABELA_DIM_ASSUNTOS: ["ID_JULGADO_FK", "TIPO_ASSUNTO", "TERMO"],
+}
+
+# Pool de conexões do ETL: escrita da FATO, leitura da Staging e uma conexão por DIMENSIONAL carregada em paralelo
+POOL_MIN_CONEXOES = 2
+POOL_MAX_CONEXOES = 8
+_POOL = None
+
+# Parâmetros de sessão das conexões do ETL (somente destas sessões, não do servidor), enviados na abertura
+# da conexão (options do libpq): valem antes da criação das tabelas temporárias e sem idas extras ao banco.
+# synchronous_commit=off: o COMMIT de cada lote não espera o fsync do WAL; numa queda perde-se no máximo
+# o último instante de lotes, refeitos pela próxima execução (o UPSERT a partir da Staging é idempotente).
+OPCOES_SESSAO_ETL = "-c synchronous_commit=off -c temp_buffers=256MB -c work_mem=64MB"
+
+# Leitura da Staging em fluxo: linhas trazidas do cursor de servidor a cada ida ao banco
+ITERSIZE_LEITURA = 2000
+
+# Transformação (T) em processos separados: o trabalho de regex/JSON é CPU puro e o GIL impede ganho com threads.
+# Cada processo recebe as linhas em blocos de CHUNKSIZE_TRANSFORMACAO (menos trocas entre processos).
+PROCESSOS_TRANSFORMACAO = os.cpu_count() or 1
+CHUNKSIZE_TRANSFORMACAO = 500
+# Linhas lidas da Staging por janela: a próxima janela só é lida depois de consumidos os resultados da anterior
+# (imap_unordered sozinho esvaziaria o cursor sem esperar a carga, acumulando tudo em memória)
+JANELA_TRANSFORMACAO = CHUNKSIZE_TRANSFORMACAO * PROCESSOS_TRANSFORMACAO * 2
+
+# Registros de FATO por lote (um COMMIT por lote). As DIMENSIONAIS seguem o lote da sua FATO, qualquer que seja
+# o número de referências/assuntos: a carga é por COPY, sem parâmetros de bind, então o limite de 65535
+# parâmetros por comando não se aplica, e as chaves estrangeiras exigem a FATO gravada antes das DIMENSIONAIS.
+TAMANHO_LOTE = 1000
+
+# Tabelas temporárias de carga (uma por tabela do DW): os lotes entram por COPY e seguem para o DW
+# em um único INSERT ... SELECT ... ON CONFLICT. ON COMMIT DELETE ROWS esvazia a tabela a cada lote commitado.
+PREFIXO_TEMPORARIA = "tmp_"
+
+# Escape do formato texto do COPY: barra invertida, tab e quebras de linha
+_ESCAPE_COPY = str.maketrans({"\\": "\\\\", "\t": "\\t", "\n": "\\n", "\r": "\\r"})
+
 # Configurações de Log
 PASTA_BASE = r"D:\Sincronizado\tecnologia\data\stj-datalake" 
 LOG_FILE_NAME = "dw_etl_status.log"
@@ -67,25 +115,43 @@ def _setup_environment(base_path: str):
 # 2. FUNÇÕES DE TRANSFORMAÇÃO (T)
 # =================================================================
 
+# Expressões regulares compiladas uma única vez (executadas para cada registro da Staging)
+_ESPACOS_RE = re.compile(r'\s+')
+_DATA_AAAAMMDD_RE = re.compile(r'^\d{8}$')
+_DATA_DJ_RE = re.compile(r'DATA:(\d{2}/\d{2}/\d{4})')
+# Referência legislativa em uma única avaliação (grupos nomeados), na mesma prioridade das buscas separadas:
+# LEG:FED (com o dispositivo ART/INC/PAR, se houver, em qualquer ponto do texto) e, só na falta dele, SUM:
+_REFERENCIA_RE = re.compile(
+    r'(?=.*?LEG:FED (?P<tipo>\w+):(?P<nome>\*+|[A-Z0-9]+))'
+    r'(?:(?=.*?ART:(?P<art>\w+) (?:INC:(?P<inc>\w+))? (?:PAR:(?P<par>\w+))?))?'
+    r'|.*?SUM:(?P<sumula>\d+)'
+)
+
+# Padrões de resultado, unidos em uma alternação: uma busca por lista, e não uma por padrão.
+# IGNORECASE dispensa a cópia em maiúsculas (.upper()) do texto da decisão + ementa a cada registro.
+PADROES_FAVORAVEIS = [r'DAR PROVIMENTO', r'DEU PROVIMENTO', r'ACOLHER OS EMBARGOS', r'CONHECER.*?E DAR PROVIMENTO', r'JULGAR PROCEDENTE']
+PADROES_DESFAVORAVEIS = [r'NEGAR PROVIMENTO', r'NEGOU PROVIMENTO', r'REJEITAR OS EMBARGOS', r'NÃO CONHECER DO RECURSO', r'INDEFERIR O PEDIDO', r'JULGAR IMPROCEDENTE']
+_FAVORAVEL_RE = re.compile('|'.join(PADROES_FAVORAVEIS), re.IGNORECASE)
+_DESFAVORAVEL_RE = re.compile('|'.join(PADROES_DESFAVORAVEIS), re.IGNORECASE)
+
 def limpar_texto(texto: Any) -> str:
     """ Remove ruídos de strings (quebras de linha, espaços múltiplos). """
     if texto is None: return ""
     if isinstance(texto, list):
-        texto = " ".join([str(item) for item in texto if item is not None])
+        texto = " ".join(map(str, [item for item in texto if item is not None]))
     
-    texto = str(texto).replace('\n', ' ').replace('\r', ' ').replace('\t', ' ')
-    texto = re.sub(r'\s+', ' ', texto).strip()
-    return texto
+    # \s+ já inclui \n, \r e \t: uma única passada troca as quebras e colapsa os espaços
+    return _ESPACOS_RE.sub(' ', str(texto)).strip()
 
 def extrair_data(data_string: str) -> datetime | None:
     """ Converte strings de data em formatos variados para objeto date. """
     if not data_string: return None
         
-    if re.match(r'^\d{8}$', data_string):
+    if _DATA_AAAAMMDD_RE.match(data_string):
         try: return datetime.strptime(data_string, '%Y%m%d').date()
         except ValueError: pass
             
-    match_dj = re.search(r'DATA:(\d{2}/\d{2}/\d{4})', data_string)
+    match_dj = _DATA_DJ_RE.search(data_string)
     if match_dj:
         try: return datetime.strptime(match_dj.group(1), '%d/%m/%Y').date()
         except ValueError: pass
@@ -95,15 +161,12 @@ def extrair_data(data_string: str) -> datetime | None:
             
     return None
 
-def extrair_resultado_binario(decisao_texto: str, ementa_texto: str) -> bool | None:
-    """ Inferência de resultado binário (Provido/Negado). """
-    texto = (limpar_texto(decisao_texto) + " " + limpar_texto(ementa_texto)).upper()
+def extrair_resultado_binario(decisao_limpa: str, ementa_limpa: str) -> bool | None:
+    """ Inferência de resultado binário (Provido/Negado) a partir dos textos já limpos (limpar_texto). """
+    texto = decisao_limpa + " " + ementa_limpa
     
-    padroes_favoraveis = [r'DAR PROVIMENTO', r'DEU PROVIMENTO', r'ACOLHER OS EMBARGOS', r'CONHECER.*E DAR PROVIMENTO', r'JULGAR PROCEDENTE']
-    padroes_desfavoraveis = [r'NEGAR PROVIMENTO', r'NEGOU PROVIMENTO', r'REJEITAR OS EMBARGOS', r'NÃO CONHECER DO RECURSO', r'INDEFERIR O PEDIDO', r'JULGAR IMPROCEDENTE']
-    
-    if any(re.search(p, texto) for p in padroes_favoraveis): return True
-    if any(re.search(p, texto) for p in padroes_desfavoraveis): return False
+    if _FAVORAVEL_RE.search(texto): return True
+    if _DESFAVORAVEL_RE.search(texto): return False
         
     return None
 
@@ -119,28 +182,26 @@ def extrair_referencias_legais(refs_brutas: str, id_julgado: int) -> List[Dict[s
     for ref_dict in refs:
         norma_bruta = limpar_texto(ref_dict.get('referencia', ''))
         
-        match_tipo = re.search(r'LEG:FED (\w+):(\*+|[A-Z0-9]+)', norma_bruta)
-        if match_tipo:
-            tipo, nome_norma = match_tipo.groups()
-            match_disp = re.search(r'ART:(\w+) (?:INC:(\w+))? (?:PAR:(\w+))?', norma_bruta)
+        # match() ancorado no início: as antecipações (?=...) procuram cada parte em todo o texto
+        match_ref = _REFERENCIA_RE.match(norma_bruta)
+        if not match_ref:
+            continue
+
+        if match_ref['tipo']:
             dispositivo = ""
-            if match_disp:
-                art, inc, par = match_disp.groups()
-                dispositivo += f"ART:{art}"
-                if par: dispositivo += f" PAR:{par}"
-                if inc: dispositivo += f" INC:{inc}"
+            if match_ref['art']:
+                dispositivo += f"ART:{match_ref['art']}"
+                if match_ref['par']: dispositivo += f" PAR:{match_ref['par']}"
+                if match_ref['inc']: dispositivo += f" INC:{match_ref['inc']}"
 
             referencias_estruturadas.append({
-                "ID_JULGADO_FK": id_julgado, "TIPO_NORMA": tipo, "NORMA_NOME": nome_norma, "ARTIGO_DISPOSITIVO": dispositivo,
+                "ID_JULGADO_FK": id_julgado, "TIPO_NORMA": match_ref['tipo'], "NORMA_NOME": match_ref['nome'], "ARTIGO_DISPOSITIVO": dispositivo,
             })
         
-        elif 'SUM:' in norma_bruta:
-            match_sumula = re.search(r'SUM:(\d+)', norma_bruta)
-            if match_sumula:
-                sumula_num = match_sumula.group(1)
-                referencias_estruturadas.append({
-                    "ID_JULGADO_FK": id_julgado, "TIPO_NORMA": "SUMULA", "NORMA_NOME": f"SUMULA {sumula_num}", "ARTIGO_DISPOSITIVO": "",
-                })
+        else:
+            referencias_estruturadas.append({
+                "ID_JULGADO_FK": id_julgado, "TIPO_NORMA": "SUMULA", "NORMA_NOME": f"SUMULA {match_ref['sumula']}", "ARTIGO_DISPOSITIVO": "",
+            })
             
     return referencias_estruturadas
 
@@ -162,7 +223,7 @@ def extrair_assuntos_e_teses(campos: Dict[str, str], id_julgado: int) -> List[Di
 
     return assuntos
 
-def tratar_registro_etl(registro: Dict[str, Any], nomes_colunas: List[str]) -> Tuple[Dict[str, Any], List[Dict[str, Any]], List[Dict[str, Any]]]:
+def tratar_registro_etl(registro: Dict[str, Any]) -> Tuple[Dict[str, Any], List[Dict[str, Any]], List[Dict[str, Any]]]:
     """ Aplica todas as transformações ETL em um único registro. """
     
     try: id_julgado = int(registro.get("id")) 
@@ -171,6 +232,10 @@ def tratar_registro_etl(registro: Dict[str, Any], nomes_colunas: List[str]) -> T
         except (ValueError, TypeError):
             return None, [], []
 
+    # Os maiores campos (ementa e decisão) são limpos uma única vez e reaproveitados na inferência do resultado
+    ementa_limpa = limpar_texto(registro.get("ementa"))
+    decisao_limpa = limpar_texto(registro.get("decisao"))
+
     registro_fato = {
         "ID_JULGADO": id_julgado,
         # 🟢 CORREÇÃO: Mapeamento de ID_ORIGEM_NATURAL para resolver a restrição NOT NULL
@@ -183,13 +248,15 @@ def tratar_registro_etl(registro: Dict[str, Any], nomes_colunas: List[str]) -> T
         "ORGAO_JULGADOR": limpar_texto(registro.get("nomeOrgaoJulgador")),
         "MINISTRO_RELATOR": limpar_texto(registro.get("ministroRelator")),
         
-        "RESULTADO_BINARIO": extrair_resultado_binario(registro.get("decisao", ""), registro.get("ementa", "")),
+        "RESULTADO_BINARIO": extrair_resultado_binario(decisao_limpa, ementa_limpa),
         "TEMA_REPETITIVO": limpar_texto(registro.get("tema")),
-        "EMENTA_LIMPA": limpar_texto(registro.get("ementa")),
-        "DECSIAO_TEOR_LIMPO": limpar_texto(registro.get("decisao")),
+        "EMENTA_LIMPA": ementa_limpa,
+        "DECSIAO_TEOR_LIMPO": decisao_limpa,
         "ACORDAOS_SIMILARES_LIMPO": limpar_texto(registro.get("acordaosSimilares")),
         "JURISPRUDENCIA_CITADA_LIMPA": limpar_texto(registro.get("jurisprudenciaCitada")),
-        "TEOR_BRUTO_JSON": json.dumps({k: registro[k] for k in nomes_colunas if k in registro}, default=str), 
+        # O registro já é montado só com as colunas lidas da Staging: serializado direto, sem dict intermediário.
+        # (O COPY em texto não passa pelos adaptadores do psycopg2, então psycopg2.extras.Json não se aplica aqui.)
+        "TEOR_BRUTO_JSON": json.dumps(registro, default=str), 
     }
     
     referencias_legais = extrair_referencias_legais(registro.get("referenciasLegislativas", "") or "", id_julgado)
@@ -203,48 +270,161 @@ def tratar_registro_etl(registro: Dict[str, Any], nomes_colunas: List[str]) -> T
 
     return registro_fato, referencias_legais, assuntos_segmentados
 
+# Nomes das colunas da Staging em cada processo de transformação (definidos pelo initializer do Pool)
+_NOMES_COLUNAS: List[str] = []
+
+def _inicializar_processo_transformacao(nomes_colunas: List[str]):
+    """ Initializer do Pool: guarda os nomes das colunas no processo filho (enviados uma vez, e não a cada linha). """
+    global _NOMES_COLUNAS
+    _NOMES_COLUNAS = nomes_colunas
+
+def _tratar_linha(linha_bruta: Tuple | None) -> Tuple[Dict[str, Any], List[Dict[str, Any]], List[Dict[str, Any]]] | None:
+    """ Transforma uma linha crua da Staging (executado nos processos do Pool). None para linha nula. """
+    if linha_bruta is None:
+        return None
+    return tratar_registro_etl(dict(zip(_NOMES_COLUNAS, linha_bruta)))
+
+def _transformar_em_janelas(pool_transformacao, read_cursor):
+    """ Distribui as linhas do cursor entre os processos em janelas de JANELA_TRANSFORMACAO (memória limitada). """
+    while True:
+        janela = read_cursor.fetchmany(JANELA_TRANSFORMACAO)
+        if not janela:
+            return
+        yield from pool_transformacao.imap_unordered(_tratar_linha, janela, chunksize=CHUNKSIZE_TRANSFORMACAO)
+
+
 # =================================================================
 # 3. CARREGAMENTO (L) e PROCESSO PRINCIPAL - COM CURSORS DUPLOS
 # =================================================================
 
+def _tabela_temporaria(tabela: str) -> str:
+    """ Nome da tabela temporária de carga de uma tabela do DW. """
+    return f"{PREFIXO_TEMPORARIA}{tabela.lower()}"
+
+def preparar_tabelas_temporarias(cursor):
+    """ Cria (uma vez por sessão) as tabelas temporárias de carga, com as mesmas colunas das tabelas do DW. """
+    # CREATE TABLE AS copia apenas colunas e tipos (sem NOT NULL/defaults): as chaves SERIAL não enviadas
+    # pelo ETL (ex.: id_ref_legal) ficam nulas na temporária e são geradas no INSERT no DW
+    for tabela in CHAVES_CONFLITO:
+        cursor.execute(
+            f"CREATE TEMP TABLE IF NOT EXISTS {_tabela_temporaria(tabela)} ON COMMIT DELETE ROWS "
+            f"AS TABLE {tabela} WITH NO DATA;"
+        )
+
+def _valor_copy(valor: Any) -> str:
+    """ Converte um valor para o formato texto do COPY (NULL = \\N). """
+    if valor is None: return "\\N"
+    if isinstance(valor, bool): return "t" if valor else "f"
+    if isinstance(valor, (date, datetime)): return valor.isoformat()
+    return str(valor).translate(_ESCAPE_COPY)
+
+# Comandos UPSERT já preparados (PREPARE) em cada conexão: (PID do backend, nome do comando)
+_UPSERTS_PREPARADOS = set()
+
+def _montar_upsert(tabela: str, colunas: Tuple[str, ...]) -> str:
+    """ Monta o INSERT ... SELECT ... ON CONFLICT da temporária de carga para a tabela do DW. """
+    colunas_sql = ", ".join(colunas)
+    chave_conflito = CHAVES_CONFLITO[tabela]
+    ignorar = set(chave_conflito)
+    if tabela == TABELA_FATO:
+        ignorar.add('TEOR_BRUTO_JSON')
+    set_updates = ", ".join([f"{col} = EXCLUDED.{col}" for col in colunas if col not in ignorar])
+    return (
+        f"INSERT INTO {tabela} ({colunas_sql}) SELECT {colunas_sql} FROM {_tabela_temporaria(tabela)} "
+        f"ON CONFLICT ({', '.join(chave_conflito)}) "
+        # Sem colunas a atualizar (todas fazem parte da chave), o conflito é apenas ignorado
+        + (f"DO UPDATE SET {set_updates}" if set_updates else "DO NOTHING")
+    )
+
 def inserir_em_lote(cursor, tabela: str, dados: List[Dict[str, Any]]):
     """ 
     Função auxiliar para inserção eficiente de múltiplos registros com lógica UPSERT (ON CONFLICT). 
-    Recebe um cursor SIMPLES (não nomeado).
+    Recebe um cursor SIMPLES (não nomeado) de uma sessão com as tabelas temporárias já criadas.
     """
     if not dados: return
 
     colunas = list(dados[0].keys())
     colunas_sql = ", ".join(colunas)
-    placeholders = ", ".join(["%s"] * len(colunas))
-    valores = [[item.get(coluna) for coluna in colunas] for item in dados]
-    
-    set_updates = ", ".join([f"{col} = EXCLUDED.{col}" for col in colunas])
-    
-    chave_conflito = None
+    chave_conflito = CHAVES_CONFLITO[tabela]
+    temporaria = _tabela_temporaria(tabela)
+
+    # Um único INSERT ... SELECT não pode atualizar a mesma chave duas vezes
+    # ("ON CONFLICT DO UPDATE command cannot affect row a second time"): mantém a última ocorrência
+    unicos = {tuple(item.get(col) for col in chave_conflito): item for item in dados}
+
+    # 1. COPY do lote para a tabela temporária: sem o parse de um INSERT por linha no servidor
+    buffer = io.StringIO()
+    for item in unicos.values():
+        buffer.write("\t".join([_valor_copy(item.get(coluna)) for coluna in colunas]))
+        buffer.write("\n")
+    buffer.seek(0)
+    cursor.copy_expert(f"COPY {temporaria} ({colunas_sql}) FROM STDIN WITH (FORMAT text)", buffer)
+
+    # 2. UPSERT de conjunto (um único plano) da temporária para a tabela do DW, preparado uma vez por conexão:
+    # os lotes seguintes só executam o plano (sem novo parse/planejamento no servidor)
+    nome_upsert = f"upsert_{tabela.lower()}"
+    chave_preparo = (cursor.connection.get_backend_pid(), nome_upsert)
+    if chave_preparo not in _UPSERTS_PREPARADOS:
+        cursor.execute(f"PREPARE {nome_upsert} AS {_montar_upsert(tabela, tuple(colunas))}")
+        _UPSERTS_PREPARADOS.add(chave_preparo)
+    # Esvazia a temporária já dentro da transação (um segundo lote antes do COMMIT não reenviaria estas linhas),
+    # na mesma ida ao servidor do EXECUTE
+    cursor.execute(f"EXECUTE {nome_upsert}; TRUNCATE {temporaria};")
+
+
+def _obter_pool() -> ThreadedConnectionPool:
+    """ Cria o pool de conexões na primeira utilização. """
+    global _POOL
+    if _POOL is None:
+        _POOL = ThreadedConnectionPool(POOL_MIN_CONEXOES, POOL_MAX_CONEXOES, options=OPCOES_SESSAO_ETL, **DB_CONFIG)
+    return _POOL
+
+def _fechar_pool():
+    """ Fecha todas as conexões do pool ao final do ETL. """
+    global _POOL
+    if _POOL is not None:
+        _POOL.closeall()
+        _POOL = None
+
+@contextmanager
+def conexao_do_pool():
+    """ Empresta uma conexão do pool (rollback em caso de erro) e a devolve ao final. """
+    pool = _obter_pool()
+    conn = pool.getconn()
+    try:
+        yield conn
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        pool.putconn(conn)
 
-    if tabela == TABELA_FATO:
-        chave_conflito = "ID_JULGADO"
-        set_updates = ", ".join([f"{col} = EXCLUDED.{col}" for col in colunas if col not in [chave_conflito, 'TEOR_BRUTO_JSON']]) 
-        
-    elif tabela == TABELA_DIM_REF:
-        chave_conflito = "ID_JULGADO_FK, TIPO_NORMA, NORMA_NOME, ARTIGO_DISPOSITIVO"
-        
-    elif tabela == TABELA_DIM_ASSUNTOS:
-        chave_conflito = "ID_JULGADO_FK, TIPO_ASSUNTO, TERMO"
-        
-    
-    if chave_conflito:
-        # Comando SQL com UPSERT (ON CONFLICT)
-        comando_sql = (
-            f"INSERT INTO {tabela} ({colunas_sql}) VALUES ({placeholders}) "
-            f"ON CONFLICT ({chave_conflito}) DO UPDATE SET {set_updates};"
-        )
-    else:
-        # Insere sem UPSERT
-        comando_sql = f"INSERT INTO {tabela} ({colunas_sql}) VALUES ({placeholders});"
-        
-    cursor.executemany(comando_sql, valores)
+# Conexões do pool (PID do backend) que já criaram as tabelas temporárias de carga nesta sessão
+_CONEXOES_PREPARADAS = set()
+
+def _carregar_dimensao(tabela: str, dados: List[Dict[str, Any]]):
+    """ Carrega (UPSERT) o lote de uma DIMENSIONAL em uma conexão própria do pool e faz o COMMIT. """
+    if not dados: return
+    with conexao_do_pool() as conn_dim:
+        with conn_dim.cursor() as cursor:
+            if conn_dim.get_backend_pid() not in _CONEXOES_PREPARADAS:
+                preparar_tabelas_temporarias(cursor)
+                _CONEXOES_PREPARADAS.add(conn_dim.get_backend_pid())
+            inserir_em_lote(cursor, tabela, dados)
+        conn_dim.commit()
+
+def gravar_lote(conn, write_cursor, executor: ThreadPoolExecutor, lote_fato, lote_dim_ref, lote_dim_assuntos):
+    """ Grava a FATO (conexão principal) e, em paralelo, as duas DIMENSIONAIS (conexões do pool). """
+    inserir_em_lote(write_cursor, TABELA_FATO, lote_fato)
+    # Chave estrangeira: a FATO precisa estar commitada antes que as outras conexões gravem as DIMENSIONAIS
+    conn.commit()
+    # As duas DIMENSIONAIS são independentes entre si: gravadas ao mesmo tempo
+    futuros = [
+        executor.submit(_carregar_dimensao, TABELA_DIM_REF, lote_dim_ref),
+        executor.submit(_carregar_dimensao, TABELA_DIM_ASSUNTOS, lote_dim_assuntos),
+    ]
+    for futuro in futuros:
+        futuro.result() # Propaga o erro de qualquer uma das cargas
 
 
 def _obter_contagem_total(conn) -> int:
@@ -278,23 +458,34 @@ def executar_etl_stj(base_path: str):
     _setup_environment(base_path)
     
     conn = None
+    read_conn = None
     read_cursor = None
     write_cursor = None
+    executor = None
     registros_lidos = 0
     registros_inseridos_fato = 0
-    TAMANHO_LOTE = 1000
     total_registros = 0 
     
     try:
         # 2. CONEXÃO E EXTRAÇÃO (E)
-        conn = psycopg2.connect(**DB_CONFIG)
+        conn = _obter_pool().getconn()
         conn.autocommit = False
+        _CONEXOES_PREPARADAS.clear()
+        _UPSERTS_PREPARADOS.clear()
+        executor = ThreadPoolExecutor(max_workers=2)
         
         total_registros = _obter_contagem_total(conn)
         
-        # Criação de DOIS cursors separados
+        # Criação de DOIS cursors separados, em conexões separadas: a leitura fica em uma única transação
+        # (cursor de servidor sem WITH HOLD, que materializaria o restante da Staging no servidor a cada COMMIT)
+        # enquanto a escrita faz COMMIT a cada lote
         write_cursor = conn.cursor() 
-        read_cursor = conn.cursor(name="etl_stj_cursor", withhold=True)
+        preparar_tabelas_temporarias(write_cursor)
+        _CONEXOES_PREPARADAS.add(conn.get_backend_pid())
+        read_conn = _obter_pool().getconn()
+        read_conn.set_session(readonly=True)
+        read_cursor = read_conn.cursor(name="etl_stj_cursor")
+        read_cursor.itersize = ITERSIZE_LEITURA
 
         # Obtém os nomes das colunas
         temp_cursor = conn.cursor()
@@ -304,56 +495,56 @@ def executar_etl_stj(base_path: str):
 
         logger.info(f"Iniciando Extração de dados da tabela Staging: {TABELA_ORIGEM} (Total: {total_registros:,})")
         
-        # O SELECT longo usa o cursor nomeado (read_cursor)
-        read_cursor.execute(f"SELECT * FROM {TABELA_ORIGEM};")
+        # O SELECT longo usa o cursor nomeado (read_cursor), com a lista explícita de colunas:
+        # a ordem das colunas lidas é exatamente a de nomes_colunas
+        read_cursor.execute(sql.SQL("SELECT {} FROM {};").format(
+            sql.SQL(", ").join(map(sql.Identifier, nomes_colunas)), sql.Identifier(TABELA_ORIGEM)
+        ))
         
         lote_fato, lote_dim_ref, lote_dim_assuntos = [], [], []
 
-        for linha_bruta in read_cursor: # Itera usando o cursor de leitura
-            registros_lidos += 1
-            
-            # 🟢 CORREÇÃO CRÍTICA: Verifica se a linha lida é None antes de tentar desempacotar
-            if linha_bruta is None:
-                logger.warning(f"Registro Nulo encontrado na iteração {registros_lidos}. Pulando.")
-                continue
-
-            registro_dict = dict(zip(nomes_colunas, linha_bruta))
-            
-            _exibir_progresso_console(registros_lidos, total_registros, registros_inseridos_fato, len(lote_fato))
+        # 3. TRANSFORMAÇÃO (T) em paralelo: as linhas do cursor de servidor são distribuídas entre os processos
+        # e os resultados voltam fora de ordem; cada resultado traz a FATO junto com as suas DIMENSIONAIS,
+        # então cada lote continua consistente (a FATO é gravada antes das DIMENSIONAIS em gravar_lote)
+        with multiprocessing.Pool(
+            processes=PROCESSOS_TRANSFORMACAO,
+            initializer=_inicializar_processo_transformacao,
+            initargs=(nomes_colunas,),
+        ) as pool_transformacao:
+            for resultado in _transformar_em_janelas(pool_transformacao, read_cursor):
+                registros_lidos += 1
+                
+                # 🟢 CORREÇÃO CRÍTICA: Verifica se a linha lida é None antes de tentar desempacotar
+                if resultado is None:
+                    logger.warning(f"Registro Nulo encontrado na iteração {registros_lidos}. Pulando.")
+                    continue
 
-            # 3. TRANSFORMAÇÃO (T)
-            registro_fato, referencias_legais, assuntos_segmentados = tratar_registro_etl(registro_dict, nomes_colunas)
-            
-            if registro_fato:
-                lote_fato.append(registro_fato)
-                lote_dim_ref.extend(referencias_legais)
-                lote_dim_assuntos.extend(assuntos_segmentados)
+                _exibir_progresso_console(registros_lidos, total_registros, registros_inseridos_fato, len(lote_fato))
 
-            # 4. CARREGAMENTO (L) - Inserção em lote
-            if len(lote_fato) >= TAMANHO_LOTE:
-                
-                inserir_em_lote(write_cursor, TABELA_FATO, lote_fato)
-                inserir_em_lote(write_cursor, TABELA_DIM_REF, lote_dim_ref)
-                inserir_em_lote(write_cursor, TABELA_DIM_ASSUNTOS, lote_dim_assuntos)
-                
-                conn.commit()
+                registro_fato, referencias_legais, assuntos_segmentados = resultado
                 
-                registros_inseridos_fato += len(lote_fato)
-                
-                _exibir_progresso_console(registros_lidos, total_registros, registros_inseridos_fato, 0)
-                sys.stdout.write('\n') 
-                logger.info(f"Lote commitado. Total inserido/atualizado (Fato): {registros_inseridos_fato:,}")
-                
-                lote_fato, lote_dim_ref, lote_dim_assuntos = [], [], []
+                if registro_fato:
+                    lote_fato.append(registro_fato)
+                    lote_dim_ref.extend(referencias_legais)
+                    lote_dim_assuntos.extend(assuntos_segmentados)
+
+                # 4. CARREGAMENTO (L) - Inserção em lote
+                if len(lote_fato) >= TAMANHO_LOTE:
+                    
+                    gravar_lote(conn, write_cursor, executor, lote_fato, lote_dim_ref, lote_dim_assuntos)
+                    
+                    registros_inseridos_fato += len(lote_fato)
+                    
+                    _exibir_progresso_console(registros_lidos, total_registros, registros_inseridos_fato, 0)
+                    sys.stdout.write('\n') 
+                    logger.info(f"Lote commitado. Total inserido/atualizado (Fato): {registros_inseridos_fato:,}")
+                    
+                    lote_fato, lote_dim_ref, lote_dim_assuntos = [], [], []
                 
         # Insere os lotes restantes
         if lote_fato:
-            inserir_em_lote(write_cursor, TABELA_FATO, lote_fato)
-            inserir_em_lote(write_cursor, TABELA_DIM_REF, lote_dim_ref)
-            inserir_em_lote(write_cursor, TABELA_DIM_ASSUNTOS, lote_dim_assuntos)
+            gravar_lote(conn, write_cursor, executor, lote_fato, lote_dim_ref, lote_dim_assuntos)
             registros_inseridos_fato += len(lote_fato)
-            
-        conn.commit()
         
         _exibir_progresso_console(registros_lidos, total_registros, registros_inseridos_fato, 0)
         sys.stdout.write('\n')
@@ -373,6 +564,10 @@ def executar_etl_stj(base_path: str):
                 read_cursor.close()
             except psycopg2.ProgrammingError: 
                 pass 
+        if executor:
+            executor.shutdown(wait=True)
+        if read_conn:
+            read_conn.rollback()
         
         if write_cursor:
             try:
@@ -380,9 +575,9 @@ def executar_etl_stj(base_path: str):
             except psycopg2.ProgrammingError:
                 pass
                 
-        if conn:
-            conn.close()
-            logger.info("Conexão com o banco de dados fechada.")
+        # Fecha todas as conexões do pool (escrita, leitura e DIMENSIONAIS)
+        _fechar_pool()
+        logger.info("Conexões com o banco de dados fechadas.")
 
 # =================================================================
 # 4. EXECUÇÃO
@@ -2,7 +2,10 @@
 # etl_vetorial_processo_atualizado.py - Processo ETL para Geração e Carregamento de Embeddings
 # Adaptado para a nova infraestrutura de BANCO DUPLO (SQL Fonte e Vetorial Destino)
 
-import psycopg2
+import psycopg
+from psycopg import sql
+from pgvector.psycopg import register_vector
+import numpy as np
 import json
 import random
 import time
@@ -11,6 +14,10 @@ import sys
 import logging
 from typing import List, Dict, Any
 
+# Manutenção do índice HNSW compartilhada com o script de criação do schema (infra/db_init_vetorial.py)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "infra"))
+from db_init_vetorial import criar_indice_vetorial, remover_indice_vetorial, executar_manutencao_indice
+
 # =================================================================
 # 1. CONFIGURAÇÕES E VARIÁVEIS GLOBAIS (AJUSTADAS PARA A NOVA INFRA)
 # =================================================================
@@ -38,9 +45,20 @@ TABELA_FONTE = "FATO_JULGADOS_STJ"
 # Tabela Destino de Vetores (no judged_llm_db)
 TABELA_VETORIAL = "DIM_VETORES_LLM"
 
-# Deve ser a mesma dimensão configurada em 'criar_schema_vetorial.py'
+# Deve ser a mesma dimensão configurada em 'infra/db_init_vetorial.py'
 DIMENSAO_VETOR = 768 
 
+# Colunas da carga vetorial e seus tipos no banco (o COPY binário exige os tipos exatos)
+COLUNAS_VETORIAIS = ["ID_JULGADO_FK", "TEXTO_FONTE", "TIPO_FONTE", "EMBEDDING"]
+TIPOS_COPY_VETORIAL = ["int4", "text", "varchar", "halfvec"]
+
+# A partir deste volume de novos registros, o índice HNSW é excluído antes da carga e reconstruído
+# (em paralelo) uma única vez ao final, em vez de atualizar o grafo a cada vetor inserido.
+LIMITE_CARGA_EM_MASSA = 1000
+
+# Tabela temporária (por conexão) que recebe o COPY antes do UPSERT na tabela vetorial
+TABELA_STAGING_VETORIAL = f"{TABELA_VETORIAL.lower()}_staging"
+
 # Configurações de Log
 PASTA_BASE = r"D:\Sincronizado\tecnologia\data\stj-postgres-llm" 
 # PASTA_BASE = os.path.join(os.getcwd(), "dw_vetorial_logs") 
@@ -121,8 +139,8 @@ def criar_registro_vetorial(registro_fato: Dict[str, Any]) -> Dict[str, Any] | N
             "ID_JULGADO_FK": id_julgado,
             "TEXTO_FONTE": texto_embedding,
             "TIPO_FONTE": "ACORDAO_COMPLETO",
-            # Converte o vetor para o formato de string que o psycopg2 entende
-            "EMBEDDING": f"[{','.join(map(str, embedding_vector))}]" 
+            # Array numpy: enviado em formato binário pelo pgvector (sem serializar cada dimensão em texto)
+            "EMBEDDING": np.asarray(embedding_vector, dtype=np.float32)
         }
     except Exception as e:
         logger.error(f"Erro fatal ao gerar embedding para ID {id_julgado}: {e}")
@@ -132,26 +150,53 @@ def criar_registro_vetorial(registro_fato: Dict[str, Any]) -> Dict[str, Any] | N
 # 3. FUNÇÕES DE CARREGAMENTO (L) - SEM MUDANÇAS
 # =================================================================
 
+# Comandos SQL montados uma única vez (sql.Identifier: nomes citados com segurança; em minúsculas,
+# como o PostgreSQL armazena os nomes criados sem aspas)
+_COLUNAS_VETORIAIS_SQL = sql.SQL(", ").join(sql.Identifier(coluna.lower()) for coluna in COLUNAS_VETORIAIS)
+
+SQL_SELECT_FONTE = sql.SQL(
+    "SELECT id_julgado, ementa_limpa, decsiao_teor_limpo FROM {} ORDER BY id_julgado ASC;"
+).format(sql.Identifier(TABELA_FONTE.lower()))
+
+SQL_SELECT_VETORIZADOS = sql.SQL("SELECT id_julgado_fk FROM {};").format(sql.Identifier(TABELA_VETORIAL.lower()))
+
+SQL_CREATE_STAGING = sql.SQL(
+    "CREATE TEMP TABLE IF NOT EXISTS {} (LIKE {} INCLUDING DEFAULTS) ON COMMIT DELETE ROWS;"
+).format(sql.Identifier(TABELA_STAGING_VETORIAL), sql.Identifier(TABELA_VETORIAL.lower()))
+
+SQL_COPY_STAGING = sql.SQL("COPY {} ({}) FROM STDIN (FORMAT BINARY)").format(
+    sql.Identifier(TABELA_STAGING_VETORIAL), _COLUNAS_VETORIAIS_SQL
+)
+
+# IMPORTANTE: A tabela DIM_VETORES_LLM deve ter uma PRIMARY KEY em ID_JULGADO_FK
+# para que o ON CONFLICT funcione corretamente. Verifique o script de criação!
+SQL_UPSERT_VETORIAL = sql.SQL("""
+    INSERT INTO {} ({}) 
+    SELECT {} FROM {} 
+    ON CONFLICT (id_julgado_fk) DO UPDATE 
+    SET embedding = EXCLUDED.embedding, texto_fonte = EXCLUDED.texto_fonte;
+""").format(
+    sql.Identifier(TABELA_VETORIAL.lower()), _COLUNAS_VETORIAIS_SQL,
+    _COLUNAS_VETORIAIS_SQL, sql.Identifier(TABELA_STAGING_VETORIAL)
+)
+
+def preparar_staging_vetorial(cursor):
+    """ Cria a tabela temporária de staging (mesma estrutura da tabela vetorial), esvaziada a cada commit. """
+    cursor.execute(SQL_CREATE_STAGING)
+
 def inserir_em_lote(cursor, dados: List[Dict[str, Any]]):
     """ 
-    Insere os registros vetoriais na tabela DIM_VETORES_LLM com UPSERT.
+    Insere os registros vetoriais na tabela DIM_VETORES_LLM com UPSERT: COPY binário
+    (embedding como halfvec) para a tabela de staging e um único INSERT ... SELECT ... ON CONFLICT.
     """
     if not dados: return
 
-    colunas = list(dados[0].keys())
-    colunas_sql = ", ".join(colunas)
-    placeholders = ", ".join(["%s"] * len(colunas))
-    valores = [[item.get(coluna) for coluna in colunas] for item in dados]
-    
-    # IMPORTANTE: A tabela DIM_VETORES_LLM deve ter uma PRIMARY KEY em ID_JULGADO_FK
-    # para que o ON CONFLICT funcione corretamente. Verifique o script de criação!
-    comando_sql = f"""
-        INSERT INTO {TABELA_VETORIAL} ({colunas_sql}) 
-        VALUES ({placeholders}) 
-        ON CONFLICT (ID_JULGADO_FK) DO UPDATE 
-        SET EMBEDDING = EXCLUDED.EMBEDDING, TEXTO_FONTE = EXCLUDED.TEXTO_FONTE;
-    """
-    cursor.executemany(comando_sql, valores)
+    with cursor.copy(SQL_COPY_STAGING) as copy:
+        copy.set_types(TIPOS_COPY_VETORIAL)
+        for item in dados:
+            copy.write_row([item.get(coluna) for coluna in COLUNAS_VETORIAIS])
+
+    cursor.execute(SQL_UPSERT_VETORIAL)
 
 # =================================================================
 # 4. EXECUÇÃO ETL (E, T, L) - ADAPTADA PARA DUAS CONEXÕES
@@ -165,16 +210,23 @@ def executar_etl_vetorial(base_path: str):
     
     conn_sql = None
     conn_vector = None
+    indice_removido = False
     
     try:
         # 1.1 Conexão com o Banco de Dados SQL (Fonte)
-        conn_sql = psycopg2.connect(**DB_CONFIG_SQL_SOURCE)
+        conn_sql = psycopg.connect(**DB_CONFIG_SQL_SOURCE)
         cursor_sql = conn_sql.cursor()
         
         # 1.2 Conexão com o Banco de Dados Vetorial (Destino)
-        conn_vector = psycopg2.connect(**DB_CONFIG_VECTOR_TARGET)
+        conn_vector = psycopg.connect(**DB_CONFIG_VECTOR_TARGET)
         conn_vector.autocommit = False
+        # Registra os tipos do pgvector (vector/halfvec) para o COPY binário dos embeddings
+        register_vector(conn_vector)
         cursor_vector = conn_vector.cursor()
+        # Commit assíncrono na sessão de carga: não espera o flush do WAL a cada lote. Uma queda do
+        # servidor pode perder os últimos lotes, que são revetorizados na próxima execução (IDs pendentes).
+        cursor_vector.execute("SET synchronous_commit = off;")
+        preparar_staging_vetorial(cursor_vector)
 
         # 2. EXTRAÇÃO (E) - Otimizada com LEFT JOIN (usando o cursor_sql)
         # Seleciona registros da tabela FATO (SQL) que AINDA NÃO possuem um vetor 
@@ -186,11 +238,11 @@ def executar_etl_vetorial(base_path: str):
         logger.info("Iniciando Extração de IDs da Fonte SQL e Destino Vetorial...")
         
         # a) Extrai todos os IDs da Fonte (SQL)
-        cursor_sql.execute(f"SELECT id_julgado, ementa_limpa, decsiao_teor_limpo FROM {TABELA_FONTE} ORDER BY id_julgado ASC;")
+        cursor_sql.execute(SQL_SELECT_FONTE)
         dados_fonte = cursor_sql.fetchall()
         
         # b) Extrai todos os IDs que JÁ foram vetorizados (Vetorial)
-        cursor_vector.execute(f"SELECT ID_JULGADO_FK FROM {TABELA_VETORIAL};")
+        cursor_vector.execute(SQL_SELECT_VETORIZADOS)
         ids_vetorizados = {row[0] for row in cursor_vector.fetchall()}
 
         # c) Filtra os dados da fonte para obter apenas os NOVOS IDs
@@ -204,6 +256,15 @@ def executar_etl_vetorial(base_path: str):
         logger.info(f"Total de registros já vetorizados: {len(ids_vetorizados)}")
         logger.info(f"Total de NOVOS registros a processar: {total_a_processar}")
 
+        # Carga em massa: exclui o índice HNSW antes da ingestão
+        if total_a_processar >= LIMITE_CARGA_EM_MASSA:
+            logger.info("Carga em massa: excluindo o índice HNSW para reconstruí-lo ao final.")
+            # Encerra a transação aberta nesta conexão (staging e SELECT dos vetorizados): o AccessShareLock
+            # em DIM_VETORES_LLM bloquearia o DROP INDEX da outra conexão, que esperaria para sempre
+            conn_vector.commit()
+            executar_manutencao_indice(remover_indice_vetorial)
+            indice_removido = True
+
         # 3. TRANSFORMAÇÃO (T) em Lote e CARREGAMENTO (L)
         lote_vetorial = []
         registros_processados = 0
@@ -232,7 +293,7 @@ def executar_etl_vetorial(base_path: str):
         logger.info("\n--- ETL VETORIAL CONCLUÍDO ---")
         logger.info(f"Total de novos registros processados e vetorizados: {registros_processados}")
 
-    except (Exception, psycopg2.Error) as error:
+    except (Exception, psycopg.Error) as error:
         logger.critical(f"ERRO CRÍTICO DURANTE O ETL Vetorial: {error}")
         if conn_vector: conn_vector.rollback()
             
@@ -243,6 +304,15 @@ def executar_etl_vetorial(base_path: str):
             conn_vector.close()
         logger.info("Conexões com os bancos de dados fechadas.")
 
+        # Carga em massa: reconstrói o índice HNSW uma única vez, já com todos os vetores
+        # (também após uma falha, para não deixar a tabela sem índice)
+        if indice_removido:
+            logger.info("Reconstruindo o índice HNSW após a carga em massa...")
+            try:
+                executar_manutencao_indice(criar_indice_vetorial)
+            except Exception as error:
+                logger.critical(f"ERRO ao reconstruir o índice HNSW (execute infra/db_init_vetorial.py): {error}")
+
 # =================================================================
 # 5. EXECUÇÃO
 # =================================================================